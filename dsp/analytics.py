@@ -1,26 +1,102 @@
 import logging
+import os
 import textwrap
 
 import matplotlib.pyplot as plt
-import mne
 import numpy as np
 import pandas as pd
 import streamlit as st
-from matplotlib.ticker import FuncFormatter
 from mywaveanalytics.libraries import filters, references, ecg_statistics
 from mywaveanalytics.pipelines import eqi_pipeline
 from mywaveanalytics.utils.params import (DEFAULT_RESAMPLING_FREQUENCY,
                                           ELECTRODE_GROUPING)
-from scipy.signal import find_peaks, peak_prominences, welch
-
-from dsp.artifact_removal import find_leads_off
-from dsp.neurometrics import get_power
+from scipy.signal import welch
+
+from dsp.artifact_removal import LEADS_OFF_CHANNELS, leads_off_mask
+from dsp.epoch_results import ALPHA_GRADES, BADS_GRADES, EpochResults
+from dsp.epochs import EpochView
+from dsp.neurometrics import get_band_powers
+from dsp.peaks import local_maxima, prominences
+from graphs.epoch_plot import draw_epoch_figure, render_epoch_pngs
 from graphs.psd_epochs import psd_peaks_3d
-from utils.graph_utils import smooth_psd
-from utils.helpers import format_func, grade_alpha, grade_bads
+from utils.cache import ByteLRUCache, memoize
+from utils.helpers import grade_alphas, grade_bads_array
 
 log = logging.getLogger(__name__)
 
+EPOCH_CACHE_BYTES = int(os.getenv("EPOCH_CACHE_BYTES", 2 * 1024**3))
+PSD_FIGURE_CACHE_BYTES = int(os.getenv("PSD_FIGURE_CACHE_BYTES", 256 * 1024**2))
+
+EPOCH_PLOT_ORDER = (
+    "Fz",
+    "Cz",
+    "Pz",
+    "Fp1",
+    "Fp2",
+    "F3",
+    "F4",
+    "F7",
+    "F8",
+    "C3",
+    "C4",
+    "T3",
+    "T4",
+    "P3",
+    "P4",
+    "T5",
+    "T6",
+    "O1",
+    "O2",
+)
+
+
+def get_sync_scores(freqs, psds, alpha_range=(8, 13)):
+    """Calculate the alpha synchrony score of every epoch in one pass.
+
+    For each epoch, the median of peak frequency x peak prominence over all alpha peaks of all
+    channels, 0 if no channel has an alpha peak.
+
+    :param freqs: (numpy.ndarray) frequencies.
+    :param psds: (numpy.ndarray) power spectral densities, shaped (epochs, channels, freqs).
+    :param alpha_range: (tuple) inclusive alpha band edges in Hz.
+    :return: (numpy.ndarray) sync score per epoch.
+    """
+    alpha_mask = (freqs >= alpha_range[0]) & (freqs <= alpha_range[1])
+    alpha_powers = psds[..., alpha_mask]
+
+    peaks = local_maxima(alpha_powers)
+    products = freqs[alpha_mask] * prominences(alpha_powers, peaks)
+    products = products.reshape(len(psds), -1)
+
+    # NaNs (non-peaks) sort last, so the median can be read off the first n_peaks values.
+    products = np.sort(products, axis=1)
+    n_peaks = peaks.reshape(len(psds), -1).sum(axis=1)
+
+    upper = np.take_along_axis(products, (n_peaks // 2)[:, None], axis=1)[:, 0]
+    lower = np.take_along_axis(
+        products, np.maximum(n_peaks - 1, 0)[:, None] // 2, axis=1
+    )[:, 0]
+    scores = np.where(n_peaks % 2 == 1, upper, (lower + upper) / 2)
+    return np.where(n_peaks > 0, scores, 0.0)
+
+
+
+@st.cache_resource
+def get_epoch_cache():
+    """Epoch analysis results shared by every session, bounded by EPOCH_CACHE_BYTES."""
+    return ByteLRUCache(max_bytes=EPOCH_CACHE_BYTES)
+
+
+@memoize(max_bytes=PSD_FIGURE_CACHE_BYTES)
+def psd_3d_figure(fingerprint, ref, time_win, _pipeline):
+    """
+    3D PSD figure of PersistPipeline, shared by every session.
+
+    Keyed by recording fingerprint, reference and time window, the PSDs are not
+    hashed. The figure must not be modified.
+    """
+    return _pipeline._draw_3d_psd()
+
 
 class StandardPipeline:
     def __init__(self, mw_object):
@@ -58,191 +134,187 @@ class StandardPipeline:
 
 class PersistPipeline:
     def __init__(self, mw_object):
-        self.mw_object = mw_object.copy()
+        # Copied when preprocessing, results served from cache never need it.
+        self.mw_object = mw_object
         self.ref = None
         self.sampling_rate = mw_object.eeg.info["sfreq"]
         self.epochs = None
         self.freqs = None
         self.psds = None
+        self.results = None
         self.data = None
+        self.fingerprint = None
+        self.time_win = None
 
     def reset(self, mw_object):
-        self.mw_object = mw_object.copy()
+        self.mw_object = mw_object
         self.ref = None
         self.sampling_rate = mw_object.eeg.info["sfreq"]
         self.epochs = None
         self.freqs = None
         self.psds = None
+        self.results = None
         self.data = None
+        self.fingerprint = None
+        self.time_win = None
 
     def run(self, time_win=10, ref="le"):
         self.ref = ref
+        self.time_win = time_win
         self.epochs = self.preprocess_data(time_win=time_win, ref=ref)
-        self.freqs, self.psds = self.calculate_psds()
+        self.analyze()
+
+    def run_cached(self, fingerprint, time_win=10, ref="le", cache=None):
+        """Run the pipeline, reusing earlier results for the same recording.
+
+        Scores and PSDs are keyed by recording fingerprint, reference and time
+        window. The filtered epochs are keyed by fingerprint and reference only,
+        so a new time window skips filtering and resampling.
+        """
+        cache = get_epoch_cache() if cache is None else cache
+        self.fingerprint, self.time_win = fingerprint, time_win
+
+        results = cache.get(("results", fingerprint, ref, time_win))
+        if results is not None:
+            for name, value in results.items():
+                setattr(self, name, value)
+            return
+
+        prepared = cache.get(("prepared", fingerprint, ref))
+        if prepared is None:
+            self.run(time_win=time_win, ref=ref)
+            cache.put(
+                ("prepared", fingerprint, ref),
+                {
+                    "epochs": self.epochs,
+                    "sampling_rate": self.sampling_rate,
+                },
+            )
+        else:
+            self.ref = ref
+            self.sampling_rate = prepared["sampling_rate"]
+            self.epochs = prepared["epochs"].with_duration(
+                time_win, overlap=time_win - 1
+            )
+            self.analyze()
+
+        results = {
+            "ref": self.ref,
+            "sampling_rate": self.sampling_rate,
+            "epochs": self.epochs,
+            "freqs": self.freqs,
+            "psds": self.psds,
+            "results": self.results,
+            "data": self.data,
+        }
+        # The epochs are counted too: they stay in memory with this
+        # entry after the prepared entry holding the same arrays is evicted.
+        cache.put(("results", fingerprint, ref, time_win), results)
 
-        # Flatten psds for DataFrame storage
-        flattened_psds = self.psds.reshape(
-            self.psds.shape[0], -1
-        )  # Flattening epochs, channels, and frequency bins
+    def analyze(self):
+        freqs, psds = self.calculate_psds()
 
-        self.data = pd.DataFrame(
-            {"flattened_psds": list(flattened_psds)}  # Store flattened psds
+        sync_score = get_sync_scores(freqs, psds)
+        alpha = get_band_powers(psds, freqs, bands={"alpha": (8, 13)})[:, 0]
+        bads_mask = leads_off_mask(
+            self.epochs.get_data(picks="eeg", units="uV"), psds, freqs
         )
 
-        # Reshape and calculate scores
-        self.data["sync_score"] = self.data["flattened_psds"].apply(
-            lambda flattened_psd: self.get_total_sync_score(
-                self.freqs, np.reshape(flattened_psd, self.psds.shape[1:])
-            )
+        self.results = EpochResults.from_arrays(
+            freqs, psds, LEADS_OFF_CHANNELS, sync_score, alpha, bads_mask
         )
+        self.freqs, self.psds = self.results.freqs, self.results.psds
 
-        self.data["alpha"] = self.data["flattened_psds"].apply(
-            lambda flattened_psd: get_power(
-                freqs=self.freqs, psd=np.reshape(flattened_psd, self.psds.shape[1:])
-            )
+        table = self.results.table
+        table["graded_alpha"] = pd.Categorical(
+            grade_alphas(table["alpha"].to_numpy()),
+            categories=ALPHA_GRADES,
+            ordered=True,
         )
-
-        self.data["graded_alpha"] = self.data["alpha"].apply(
-            lambda x: grade_alpha(x, self.data["alpha"].values)
+        table["graded_bads"] = pd.Categorical(
+            grade_bads_array(table["n_bads"].to_numpy()),
+            categories=BADS_GRADES,
+            ordered=True,
         )
 
-        self.data["bads"] = [
-            find_leads_off(self.epochs[i]) for i in range(len(self.epochs))
-        ]
-
-        self.data["n_bads"] = self.data["bads"].apply(lambda x: len(x))
-
-        self.data["graded_bads"] = self.data["n_bads"].apply(lambda x: grade_bads(x))
-
-        # Sort the DataFrame by score in descending order
-        self.data = self.data.sort_values(
-            by=["graded_bads", "alpha"], ascending=[True, False]
-        )
+        # Sort the table by score in descending order
+        self.results.sort(by=["graded_bads", "alpha"], ascending=[True, False])
+        self.data = self.results.table
 
-    def generate_graphs(self):
+    def generate_graphs(self, parallel=False):
         graph_df = self.data.copy()
 
         graph_df = graph_df[graph_df["sync_score"] < 200]
 
-        for idx in graph_df.index[:20]:
-            self.combined_plot(epoch_id=idx)
+        if not parallel:
+            for idx in graph_df.index[:20]:
+                self.combined_plot(epoch_id=idx)
+            return
+
+        # Render in worker processes, show each figure as soon as its turn comes.
+        figure_args = [self.epoch_figure_args(idx) for idx in graph_df.index[:20]]
+        for png in render_epoch_pngs(figure_args):
+            st.image(png, use_column_width=True)
 
     def preprocess_data(self, time_win=20, ref=None):
-        filters.eeg_filter(self.mw_object, 1, 25)
-        filters.notch(self.mw_object)
-        filters.resample(self.mw_object)
+        mw_object = self.mw_object.copy()
+        filters.eeg_filter(mw_object, 1, 25)
+        filters.notch(mw_object)
+        filters.resample(mw_object)
         self.sampling_rate = DEFAULT_RESAMPLING_FREQUENCY
 
-        raw = self.mw_object.eeg
+        raw = mw_object.eeg
 
         if ref == "tcp":
-            raw = references.temporal_central_parasagittal(self.mw_object)
+            raw = references.temporal_central_parasagittal(mw_object)
         if ref == "cz":
-            raw = references.centroid(self.mw_object)
+            raw = references.centroid(mw_object)
         if ref == "blm":
-            raw = references.bipolar_longitudinal_montage(self.mw_object)
+            raw = references.bipolar_longitudinal_montage(mw_object)
         if ref == "btm":
-            raw = bipolar_transverse_montage(self.mw_object.eeg)
+            raw = references.bipolar_transverse_montage(mw_object.eeg)
 
-        epochs = mne.make_fixed_length_epochs(
-            raw, duration=time_win, preload=True, overlap=time_win - 1
-        )
+        # Overlapping epochs are views over the continuous signal, not copies.
+        epochs = EpochView(raw, duration=time_win, overlap=time_win - 1)
         return epochs
 
-    def calculate_psds(self):
+    def calculate_psds(self, chunk_size=256):
         time_series_eeg = self.epochs.get_data(picks="eeg", units="uV")
-        freqs, psds = welch(time_series_eeg, self.sampling_rate)
+
+        # Welch materializes every segment, so only a chunk of epochs at a time.
+        chunks = [
+            welch(time_series_eeg[i : i + chunk_size], self.sampling_rate)
+            for i in range(0, len(time_series_eeg), chunk_size)
+        ]
+        freqs = chunks[0][0]
+        psds = np.concatenate([psds for _, psds in chunks])
         return freqs, psds
 
-    def get_total_sync_score(self, eeg_frequencies, power_spectral_density):
-        alpha_range = (8, 13)
-        frequency_prominence_products = []
-        for channel_powers in power_spectral_density:
-            alpha_mask = (eeg_frequencies >= alpha_range[0]) & (
-                eeg_frequencies <= alpha_range[1]
-            )
-            alpha_frequencies = eeg_frequencies[alpha_mask]
-            alpha_powers = channel_powers[alpha_mask]
-            peaks, _ = find_peaks(alpha_powers)
-            if not peaks.size:
-                continue
-            prominences = peak_prominences(alpha_powers, peaks)[0]
-            frequency_prominence_products.extend(alpha_frequencies[peaks] * prominences)
-        return (
-            np.median(frequency_prominence_products)
-            if frequency_prominence_products
-            else 0
-        )
+    def epoch_figure_args(self, epoch_id=1):
+        """Collect everything draw_epoch_figure needs to render one epoch.
 
-    def combined_plot(
-        self,
-        epoch_id=1,
-    ):
-        epochs = self.epochs[epoch_id]
+        Channels are reordered and bad leads removed with index arrays over the
+        epoch view, without building MNE Epochs copies.
+        """
         ref = self.ref
 
-        bads = self.data["bads"][epoch_id]
-
-        event_times = self.epochs.events[:, 0] / self.sampling_rate
+        bads = self.results.bads(epoch_id)
 
         # Align channel order to what the lab is used to if applicable
-        if ref not in ("tcp", "btm", "blm"):
-            new_order = [
-                "Fz",
-                "Cz",
-                "Pz",
-                "Fp1",
-                "Fp2",
-                "F3",
-                "F4",
-                "F7",
-                "F8",
-                "C3",
-                "C4",
-                "T3",
-                "T4",
-                "P3",
-                "P4",
-                "T5",
-                "T6",
-                "O1",
-                "O2",
-            ]
+        if ref in ("tcp", "btm", "blm"):
+            new_order = list(self.epochs.ch_names)
+        else:
+            new_order = list(EPOCH_PLOT_ORDER)
         if ref == "cz":
-            epochs = epochs.drop_channels(["Cz"])
             new_order.remove("Cz")
 
         if bads:
-            epochs = epochs.drop_channels(bads)
             new_order = [item for item in new_order if item not in bads]
 
-        epochs = epochs.reorder_channels(new_order)
-
-        # Calculate FFT and plot using Welch's method
-        data = epochs.get_data(picks="eeg", units="uV")[0]
-        fs = self.sampling_rate
-        dmin = data.min()  # smallest value in the array
-        dmax = np.percentile(data, 80)  # largest value in the array
-
-        n_rows, n_samples = data.shape
-
-        event_start = event_times[epoch_id]
-
-        rec_date = epochs.info["meas_date"].date().strftime("%d-%b-%Y")
-
-        n_seconds = n_samples / fs
-
-        tmin = epochs.tmin  # start time of each epoch in seconds
-        tmax = epochs.tmax  # end time of each epoch in seconds
-        t = np.linspace(event_start, event_start + n_seconds, n_samples)
-
-        # t = np.arange(0, n_samples / fs, 1/fs)   # Adjusted time vector
+        picks = [self.epochs.ch_names.index(ch) for ch in new_order]
+        data = self.epochs.get_data(picks="eeg", units="uV")[epoch_id][picks]
 
-        # Prepare figure and axis grid
-        fig = plt.figure(figsize=(24, 9))
-        gs = fig.add_gridspec(
-            n_rows, 2, width_ratios=[2, 1], wspace=-0.2
-        )  # Width ratio set to 2:1
+        rec_date = self.epochs.info["meas_date"].date().strftime("%d-%b-%Y")
 
         suffix_map = {
             "tcp": "- TCP-Referential Montage 1-25Hz Bandpass Filter",
@@ -259,11 +331,7 @@ class PersistPipeline:
             "btm": "",
             "blm": "",
         }
-        channels = epochs.pick_types(eeg=True).ch_names
-        if ref not in ("tcp", "blm", "btm"):
-            epochs = epochs.reorder_channels(new_order)
-            channels = epochs.pick_types(eeg=True).ch_names
-        channels = [i + channel_suffix_map[ref] for i in channels]
+        channels = [i + channel_suffix_map[ref] for i in new_order]
 
         plot_title = f"{rec_date} {suffix_map[ref]}"
 
@@ -274,163 +342,29 @@ class PersistPipeline:
             wrapper = textwrap.TextWrapper(width=60)  # Adjust 'width' to your needs
             plot_title = "\n".join(wrapper.wrap(plot_title))
 
-        fig.text(
-            0.14,
-            0.99,
-            plot_title,
-            fontsize=34,
-            fontweight="bold",
-            va="top",
-            ha="left",
-            **{"fontname": "DejaVu Sans"},
-        )
-
-        dr = (dmax - dmin) * 0.7  # Crowd them a bit.
-        y0 = dmin
-        y1 = (n_rows - 1) * dr + dmax
-        offsets = np.zeros((n_rows, 2), dtype=float)
-        offsets[:, 1] = np.linspace(y0, y1, n_rows)
-
-        # Reverse the array
-        # data = np.flip(data, axis=0)  # Reverse the order of the data
-
-        linecolor = "slategray"
-
-        # Create subplot for each channel
-        for i in range(n_rows):
-            # Time series plot
-            ax_time = fig.add_subplot(gs[i, 0])
-            pos = ax_time.get_position()
-            pos.x1 = 0.7  # adjust right end
-            ax_time.set_position(pos)
-            ax_time.plot(t, data[i, :] + offsets[i, 1], color="k")
-
-            for s in np.arange(event_start, event_start + n_seconds):
-                ax_time.axvline(s, 0, 1, color=linecolor, linestyle="--", alpha=0.75)
-
-            eeg_scale = round(np.max(data[i, :]), 1)
-            if i == n_rows - 1:
-                ax_time.set_xlabel("Time (s)")
-                ax_time.set_yticks([])
-            else:
-                ax_time.set_xticks([])
-                ax_time.set_yticks([])
-                ax_time.set_yticklabels([])
-
-            # Makes time series amplitude text dyanmic with the width of the plot
-            text_adjust = 20 / n_seconds
-
-            # remove borders, axis ticks, and labels
-            ax_time.set_yticklabels([])
-            ax_time.set_ylabel("")
-            ax_time.text(
-                event_start + tmin - 0.6 / text_adjust,
-                offsets[i][1],
-                channels[i],
-                fontweight="regular",
-                fontsize=9,
-                ha="center",
-                **{"fontname": "DejaVu Sans"},
-            )
-            ax_time.text(
-                event_start + tmax + 0.50 / text_adjust,
-                offsets[i][1],
-                f"{eeg_scale} µV",
-                fontweight="regular",
-                fontsize=8,
-                ha="center",
-                **{"fontname": "DejaVu Sans"},
-            )
-            # set x-axis formatter for ax_time
-            ax_time.xaxis.set_major_formatter(FuncFormatter(format_func))
-            ax_time.yaxis.set_label_coords(-0.05, 0.5)  # Adjust label position
-
-            ax_time.spines["top"].set_visible(False)
-            ax_time.spines["right"].set_visible(False)
-            ax_time.spines["bottom"].set_visible(i == n_rows - 1)
-            ax_time.spines["left"].set_visible(False)
-
-        for i in range(n_rows):
-            # Calculate FFT and plot using Welch's method
-            freqs, psd = welch(data[i], fs=fs)
-
-            # idx = np.where(freqs > 2.2)
-
-            # freqs = freqs[idx]
-            # psd = psd[:,idx]
-
-            psd = smooth_psd(psd, window_len=2)
-
-            # Select the range of frequencies of interest
-            psd_range = psd[(freqs >= 2.2) & (freqs <= 25)]
-
-            # FFT plot
-            ax_fft = fig.add_subplot(gs[i, 1])
-            pos = ax_fft.get_position()
-            pos.x0 = 0.7  # adjust left start
-            ax_fft.set_position(pos)
-
-            ax_fft.fill_between(
-                freqs, psd, color="#00FFFF"
-            )  #  "#00ffff" # fill the area under the graph
-            ax_fft.plot(freqs, psd, color="#000000", linewidth=1.5)  # 000000
-            ax_fft.set_xlim([0.75, 25])
-            ax_fft.set_ylim([0, psd_range.max()])
-
-            ax_fft.axvline(4, 0, 1, color=linecolor, linestyle="--", alpha=0.75)
-            ax_fft.axvline(8, 0, 1, color=linecolor, linestyle="--", alpha=0.75)
-            ax_fft.axvline(13, 0, 1, color=linecolor, linestyle="--", alpha=0.75)
-
-            psd_ylimit = psd_range.max()
-
-            psd_ylimit = round(psd_ylimit, 1)
-
-            if i == 0:
-                ax_fft.text(
-                    1.00,
-                    0.95,
-                    "\u03bcV\u00b2/Hz",
-                    verticalalignment="top",
-                    horizontalalignment="left",
-                    transform=ax_fft.transAxes,
-                    fontsize=9,
-                    bbox=dict(facecolor="none", edgecolor="none", boxstyle="square"),
-                )
-
-            ax_fft.text(
-                26.5,
-                0,
-                f"{psd_ylimit}",
-                fontweight="regular",
-                fontsize=8,
-                ha="center",
-                **{"fontname": "DejaVu Sans"},
-            )
+        return {
+            "data": data,
+            "fs": self.sampling_rate,
+            "event_start": self.epochs.event_times[epoch_id],
+            "channels": channels,
+            "plot_title": plot_title,
+        }
 
-            if i == n_rows - 1:
-                ax_fft.set_xlabel("Frequency (Hz)")
-                ax_fft.set_yticks([])
-                ax_fft.set_xticks(np.arange(2, 25, 2))
-            else:
-                ax_fft.set_xticks([])
-                ax_fft.set_yticks([])
-
-            ax_fft.spines["top"].set_visible(False)
-            ax_fft.spines["right"].set_visible(False)
-            ax_fft.spines["bottom"].set_visible(i == n_rows - 1)
-            ax_fft.spines["left"].set_visible(False)
-
-            spines = ["top", "right", "left", "bottom"]
-            for s in spines:
-                ax_time.spines[s].set_visible(False)
-                ax_fft.spines[s].set_visible(False)
-
-        # gs.update(wspace= -0.2, hspace= 0)
-        plt.tight_layout()
-        # plt.savefig(save)
+    def combined_plot(
+        self,
+        epoch_id=1,
+    ):
+        fig = draw_epoch_figure(**self.epoch_figure_args(epoch_id))
         st.pyplot(fig)
+        plt.close(fig)
 
     def plot_3d_psd(self):
+        """3D PSD figure, cached by fingerprint after run_cached, see psd_3d_figure."""
+        if self.fingerprint is None:
+            return self._draw_3d_psd()
+        return psd_3d_figure(self.fingerprint, self.ref, self.time_win, self)
+
+    def _draw_3d_psd(self):
         # Prepare data for 3D plot
         freqs = self.freqs
         epochs = range(self.psds.shape[0])
@@ -438,7 +372,7 @@ class PersistPipeline:
         psd_data = self.psds.mean(axis=1)  # Averaging across channels
         alpha_scores = self.data.index.values
 
-        excess_sync_score = self.data["sync_score"] > 150
+        excess_sync_score = self.data["sync_score"].sort_index().to_numpy() > 150
 
         # Filter frequencies between 4 Hz and 20 Hz
         freq_mask = (freqs >= 2.2) & (freqs <= 20)
@@ -3,6 +3,9 @@ import numpy as np
 from mywaveanalytics.libraries import eeg_computational_library
 from mywaveanalytics.utils import params
 
+# EEG channels in the order find_leads_off reports them (CHANNEL_ORDER without ECG).
+LEADS_OFF_CHANNELS = np.delete(np.asarray(params.CHANNEL_ORDER), -3, axis=0).tolist()
+
 
 def find_leads_off(raw, abs_offset_threshold=35, picks=["eeg"]):
     """Uses power spectrum analysis to detect which leads are bad (flat, artifact-heavy, high-frequency noise).
@@ -90,3 +93,55 @@ def variance_outliers(raw):
     idx = np.where(variance > threshold)[1]
 
     return variance.tolist(), idx
+
+
+def leads_off_mask(
+    epochs_data,
+    psds,
+    freqs,
+    abs_offset_threshold=35,
+    variance_threshold=3000,
+    chunk_size=256,
+):
+    """Batched equivalent of find_leads_off, flagging bad leads of every epoch at once
+    from PSDs that were already computed for the epochs.
+
+    params:
+        epochs_data (numpy.ndarray): EEG epochs in uV, shaped (epochs, channels, times).
+        psds (numpy.ndarray): power spectral densities in uV^2/Hz, shaped (epochs, channels, freqs).
+        freqs (numpy.ndarray): frequencies of the psds.
+        abs_offset_threshold (float): offset above which a lead is poorly connected.
+        variance_threshold (float): variance (uV^2) above which a lead is an outlier.
+        chunk_size (int): number of epochs whose variance is computed at a time.
+
+    returns:
+        array: boolean mask of bad leads, shaped (epochs, channels).
+    """
+    n_epochs, n_channels, n_freqs = psds.shape
+
+    # Chunked so strided epoch views are never materialized all at once.
+    variance = np.concatenate(
+        [
+            np.var(epochs_data[i : i + chunk_size], axis=2)
+            for i in range(0, n_epochs, chunk_size)
+        ]
+    )
+    high_variance = variance > variance_threshold
+
+    # One line fit call for every epoch x channel spectrum. The thresholds are
+    # calibrated on get_offsets_slopes over psd_welch output, hence V^2/Hz.
+    offsets, slopes = eeg_computational_library.get_offsets_slopes(
+        psds.reshape(-1, n_freqs) * 1e-12, freqs, span=None
+    )
+    offsets = np.asarray(offsets).reshape(n_epochs, n_channels)
+    slopes = np.asarray(slopes).reshape(n_epochs, n_channels)
+
+    with np.errstate(invalid="ignore"):
+        poor_connections = offsets > abs_offset_threshold
+        flat_channels = np.absolute(offsets) < 0.01
+        high_frequency_noise = slopes > 0
+
+    # Leads should not be removed if polyfit fails, see find_leads_off.
+    return (
+        poor_connections | flat_channels | high_frequency_noise | high_variance
+    ) & ~np.isnan(offsets)
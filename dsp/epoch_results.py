@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+ALPHA_GRADES = ["A", "B", "C", "D", "E", "F"]
+BADS_GRADES = ["A", "B", "C", "D", "F"]
+
+
+class EpochResults:
+    """Epoch analysis results of PersistPipeline.
+
+    PSDs live in one contiguous float32 array shaped (epochs, channels, freqs),
+    scalar results in a typed table indexed by epoch number. Bad leads are kept
+    as a bitmask over ch_names instead of a list per epoch.
+    """
+
+    def __init__(self, freqs, psds, ch_names, table):
+        self.freqs = freqs
+        self.psds = np.ascontiguousarray(psds, dtype=np.float32)
+        self.ch_names = list(ch_names)
+        self.table = table
+
+    @classmethod
+    def from_arrays(cls, freqs, psds, ch_names, sync_score, alpha, bads_mask):
+        """Build the results table from per-epoch arrays, in epoch order.
+
+        :param bads_mask: (numpy.ndarray) boolean bad leads, shaped (epochs, channels).
+        """
+        bits = np.left_shift(np.uint32(1), np.arange(bads_mask.shape[1], dtype=np.uint32))
+        table = pd.DataFrame(
+            {
+                "sync_score": np.asarray(sync_score, dtype=np.float64),
+                "alpha": np.asarray(alpha, dtype=np.float64),
+                "bads": (bads_mask * bits).sum(axis=1, dtype=np.uint32),
+                "n_bads": bads_mask.sum(axis=1).astype(np.int16),
+            }
+        )
+        table.index.name = "epoch"
+        return cls(freqs, psds, ch_names, table)
+
+    @property
+    def nbytes(self):
+        return self.psds.nbytes + int(self.table.memory_usage(deep=True).sum())
+
+    def psd(self, epoch_id):
+        """PSD of one epoch, shaped (channels, freqs), as a view."""
+        return self.psds[epoch_id]
+
+    def bads_mask(self):
+        """Boolean bad leads of every epoch in table order, shaped (epochs, channels)."""
+        bits = np.left_shift(np.uint32(1), np.arange(len(self.ch_names), dtype=np.uint32))
+        return (self.table["bads"].to_numpy()[:, None] & bits) != 0
+
+    def bads(self, epoch_id):
+        """Names of the bad leads of one epoch."""
+        bads = int(self.table.at[epoch_id, "bads"])
+        return [ch for i, ch in enumerate(self.ch_names) if bads >> i & 1]
+
+    def bads_names(self):
+        """Bad lead names of every epoch in table order, for display."""
+        names = np.asarray(self.ch_names, dtype=object)
+        return pd.Series(
+            [names[row].tolist() for row in self.bads_mask()], index=self.table.index
+        )
+
+    def average_psds(self, freq_slice=slice(11, 51)):
+        """Channel averaged PSDs of every epoch in table order, for display."""
+        averages = self.psds[self.table.index.to_numpy(), :, freq_slice].mean(axis=1)
+        return pd.Series(list(averages), index=self.table.index)
+
+    def sort(self, by, ascending):
+        self.table = self.table.sort_values(by=by, ascending=ascending)
@@ -0,0 +1,92 @@
+import copy
+
+import mne
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class EpochView:
+    """Fixed-length, overlapping EEG epochs exposed as strided views over one
+    continuous recording, instead of preloaded MNE Epochs.
+
+    Epoch onsets follow mne.make_fixed_length_epochs, so events, event times and
+    epoch data line up with what the MNE implementation produced. Epochs are
+    only materialized as MNE objects one at a time, through indexing.
+    """
+
+    def __init__(self, raw, duration, overlap=0.0):
+        picks = mne.pick_types(raw.info, eeg=True, exclude=[])
+
+        self.info = mne.pick_info(raw.info, picks)
+        self.ch_names = self.info.ch_names
+        self.sfreq = raw.info["sfreq"]
+        self.first_samp = raw.first_samp
+
+        # Single copy of the continuous signal, every epoch is a view into it.
+        self.signal = raw.get_data(picks=picks, units="uV")
+
+        self._set_epochs(duration, overlap)
+
+    def _set_epochs(self, duration, overlap):
+        self.n_times = int(np.round(self.sfreq * duration))
+
+        n_samples = self.signal.shape[1]
+        self.starts = np.arange(
+            0, n_samples - self.n_times + 1, self.sfreq * (duration - overlap)
+        ).astype(int)
+        self.events = np.column_stack(
+            (
+                self.starts + self.first_samp,
+                np.zeros(len(self.starts), dtype=int),
+                np.ones(len(self.starts), dtype=int),
+            )
+        )
+
+    def with_duration(self, duration, overlap=0.0):
+        """Epoch the same continuous signal with a different window, without copying it."""
+        view = copy.copy(self)
+        view._set_epochs(duration, overlap)
+        return view
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        """Build an MNE Epochs object holding the single epoch at idx."""
+        return mne.EpochsArray(
+            self.data[idx][np.newaxis] * 1e-6,
+            self.info,
+            events=self.events[[idx]],
+            tmin=0.0,
+            baseline=None,
+            verbose=False,
+        )
+
+    @property
+    def data(self):
+        """Epoch data in µV, shaped (epochs, channels, times).
+
+        A zero-copy view whenever the epoch onsets are evenly spaced samples.
+        """
+        windows = sliding_window_view(self.signal, self.n_times, axis=1)
+        windows = windows.transpose(1, 0, 2)
+
+        steps = np.unique(np.diff(self.starts))
+        if len(self.starts) > 1 and steps.size == 1:
+            return windows[self.starts[0] :: steps[0]][: len(self.starts)]
+        return windows[self.starts]
+
+    @property
+    def nbytes(self):
+        return self.signal.nbytes
+
+    @property
+    def event_times(self):
+        """Onset of every epoch, in seconds."""
+        return self.events[:, 0] / self.sfreq
+
+    def get_data(self, picks="eeg", units="uV"):
+        """Epoch data, mirroring mne.Epochs.get_data for EEG picks."""
+        if units == "uV":
+            return self.data
+        return self.data * 1e-6
@@ -1,7 +1,7 @@
 import numpy as np
 import pandas as pd
-import streamlit as st
-from scipy.signal import find_peaks
+
+from dsp.peaks import local_maxima
 
 SENSITIVITIES = {
     "1 uV": 1.0,
@@ -26,117 +26,82 @@ SENSITIVITIES = {
 
 
 
-@st.cache_data
-def scale_dataframe(df, sensitivity_factor=1.0, eeg_sensitivity_uv=None):
+def channel_extrema_stats(values, ch_names):
     """
-    Scale a dataframe with EEG (+EKG) channels so the default "sensitivity" for
-    viewing results in readable activity. This can be done by autoscaling or by a user 
-    passed in uV sensitivity value. The scaling expects a channel offset of 1.
+    Per channel median and mean of the local maxima (peaks) and local minima
+    (troughs) of a signal, used to autoscale the viewer.
+
+    Extrema of all channels are found in one vectorized pass with the same
+    rules as scipy.signal.find_peaks (dsp.peaks.local_maxima).
 
     Parameters:
-    - df: pandas.core.frame.DataFrame
-        Containing channel names with their channel data.
+    - values: numpy.ndarray
+        Signal shaped (channels, times).
+    - ch_names: list
+        Channel names, in the row order of values.
+
+    Returns:
+    - stats: pandas.core.frame.DataFrame
+        median_max, median_min, mean_max and mean_min indexed by channel, NaN
+        for channels without extrema.
+    """
+    values = np.asarray(values)
+    peaks = local_maxima(values)
+    troughs = local_maxima(-values)
+
+    stats = np.full((len(values), 4), np.nan)
+    for i, row in enumerate(values):
+        max_values, min_values = row[peaks[i]], row[troughs[i]]
+        if max_values.size:
+            stats[i, 0], stats[i, 2] = np.median(max_values), max_values.mean()
+        if min_values.size:
+            stats[i, 1], stats[i, 3] = np.median(min_values), min_values.mean()
+
+    return pd.DataFrame(
+        stats,
+        index=pd.Index(list(ch_names), name="channel"),
+        columns=["median_max", "median_min", "mean_max", "mean_min"],
+    )
+
+
+def amplitude_bound(stats):
+    """
+    Half the spread between the highest median peak and the lowest median trough
+    of a group of channels.
+
+    Parameters:
+    - stats: pandas.core.frame.DataFrame
+        Rows of channel_extrema_stats for the channels of the group.
+
+    Returns:
+    - bound: float
+    """
+    median_max = stats["median_max"].dropna()
+    median_min = stats["median_min"].dropna()
+    if median_max.empty or median_min.empty:
+        raise ValueError("No extrema to scale the channels with.")
+    return (median_max.max() + abs(median_min.min())) / 2
+
+
+def eeg_scale(stats, sensitivity_factor=1.0, eeg_sensitivity_uv=None):
+    """
+    Factor scaling EEG channels for a plotly graph with a trace offset of 1.
+
+    Parameters:
+    - stats: pandas.core.frame.DataFrame
+        channel_extrema_stats of the EEG channels, only used to autoscale, may
+        be None when eeg_sensitivity_uv is given.
     - sensitivity_factor: float
         The value used to adjust the auto-scaling
     - eeg_sensitivity_uv: float
         The value used to adjust via a uV sensitivity value passed in
 
     Returns:
-    - scaled_df: pandas.core.frame.DataFrame
-        The same df just scaled to be readable for a plotly graph with a trace offset of 1.
+    - scale: float
     """
-
-    # separate the 'Time' column
-    try:
-        times_col = df["time"]
-    except:
-        pass
-    try:
-        timestamps_col = df["timestamp"]
-    except:
-        pass
-
-    # identify ECG and EEG columns
-    try:
-        ecg_columns = df.filter(like="ECG").columns
-        eeg_columns = df.columns.difference(ecg_columns).difference(
-            ["time", "timestamp"]
-        )
-    except:
-        eeg_columns = df.columns
-
-    # function to find local maxima and minima
-    def find_extrema(signal):
-        peaks, _ = find_peaks(signal)
-        troughs, _ = find_peaks(-signal)
-        return peaks, troughs
-
-    # Function to return min/max stats for the eeg based on peaks and troughs
-    def get_min_max_stats(columns, df):
-        # calculate the median of maxima and minima for each EEG channel
-        median_max_values = []
-        median_min_values = []
-        mean_max_values = []
-        mean_min_values = []
-
-        # get the peaks and the troughs
-        for col in columns:
-            peaks, troughs = find_extrema(df[col])
-            max_values = df[col].iloc[peaks]
-            min_values = df[col].iloc[troughs]
-            if len(max_values) > 0:
-                median_max_values.append(max_values.median())
-                mean_max_values.append(max_values.mean())
-            if len(min_values) > 0:
-                median_min_values.append(min_values.median())
-                mean_min_values.append(min_values.mean())
-
-        # calculate the max of the above 0 median peaks and the min of the below 0 median troughs
-        median_max = np.max(median_max_values)
-        median_min = np.min(median_min_values)
-        mean_max = np.max(mean_max_values)
-        mean_min = np.min(mean_min_values)
-
-        return median_max, median_min, mean_max, mean_min
-
-    median_max, median_min, _, _ = get_min_max_stats(eeg_columns, df)
-    df_eeg = df[eeg_columns]
-
-    # If no uV value is provided, autoscale the eeg data, else use uV sensitivity value
     if eeg_sensitivity_uv is None:
-        # new norm: scale to -1, 1 and then adjust it to a percentage of so clean waveforms
-        #   arent reaching the bound (on average)
-        bound = (median_max + abs(median_min)) / 2
-        scaled_eeg = (df_eeg / bound) * 0.25 * sensitivity_factor
-    else:
-        # Scale the EEG data based off the uV sensitivity
-        # Multiply by 0.1 to replicate how each sensitivity looks in Persyst Insight II
-        scaled_eeg = (df_eeg / float(eeg_sensitivity_uv)) * 0.1
-
-
-    try:
-        # scale ECG column(s) separately
-        median_max, median_min, _, _ = get_min_max_stats(ecg_columns, df)
-
-        df_ecg = df[ecg_columns]
-
-        # new norm: scale to -1, 1 and then adjust it to a percentage of
-        bound = (median_max + abs(median_min)) / 2
-        scaled_ecg = (df_ecg / bound) * 0.05 * sensitivity_factor
-
-        # reattach the 'time' column and combine scaled columns
-        try:
-            scaled_df = pd.concat(
-                [times_col, timestamps_col, scaled_ecg, scaled_eeg], axis=1
-            )
-        except:
-            scaled_df = pd.concat([times_col, scaled_ecg, scaled_eeg], axis=1)
-
-    except:
-        # reattach the 'time' column and combine scaled columns
-        try:
-            scaled_df = pd.concat([times_col, timestamps_col, scaled_eeg], axis=1)
-        except:
-            scaled_df = pd.concat([times_col, scaled_eeg], axis=1)
-
-    return scaled_df
\ No newline at end of file
+        # scale to -1, 1 and then adjust it to a percentage of so clean waveforms
+        # arent reaching the bound (on average)
+        return 0.25 * sensitivity_factor / amplitude_bound(stats)
+    # Multiply by 0.1 to replicate how each sensitivity looks in Persyst Insight II
+    return 0.1 / float(eeg_sensitivity_uv)
@@ -0,0 +1,260 @@
+import logging
+import threading
+from collections.abc import Mapping
+
+import mne
+import numpy as np
+import pandas as pd
+from mywaveanalytics.utils.params import (
+    CHANNEL_ORDER_BIPOLAR_LONGITUDINAL,
+    CHANNEL_ORDER_TEMPORAL_CENTRAL_PARASAGITTAL,
+)
+from scipy import sparse
+
+from dsp.graph_preprocessing import channel_extrema_stats
+from dsp.neurometrics import CHANNEL_ORDER_EEG
+from dsp.pyramid import MinMaxPyramid
+
+log = logging.getLogger(__name__)
+
+ECG_CHANNELS = ("ECG", "ECG1", "ECG2")
+
+BIPOLAR_TRANSVERSE_PAIRS = (
+    ("F7", "Fp1"),
+    ("Fp1", "Fp2"),
+    ("Fp2", "F8"),
+    ("F7", "F3"),
+    ("F3", "Fz"),
+    ("Fz", "F4"),
+    ("F4", "F8"),
+    ("T3", "C3"),
+    ("C3", "Cz"),
+    ("Cz", "C4"),
+    ("C4", "T4"),
+    ("T5", "P3"),
+    ("P3", "Pz"),
+    ("Pz", "P4"),
+    ("P4", "T6"),
+    ("T5", "O1"),
+    ("O1", "O2"),
+    ("O2", "T6"),
+)
+
+
+def _derivations(names):
+    """Derivations of montage channel names, "A-B" is a bipolar pair, anything else referential."""
+    derivations = []
+    for name in names:
+        if "-" in name:
+            anode, cathode = name.split("-", 1)
+            derivations.append((name, [(anode, 1.0), (cathode, -1.0)]))
+        else:
+            derivations.append((name, [(name, 1.0)]))
+    return derivations
+
+
+# Each montage is a list of (output channel, [(input channel, weight), ...]).
+MONTAGES = {
+    "linked_ears": [(ch, [(ch, 1.0)]) for ch in CHANNEL_ORDER_EEG],
+    "centroid": [(ch, [(ch, 1.0), ("Cz", -1.0)]) for ch in CHANNEL_ORDER_EEG],
+    "bipolar_longitudinal": _derivations(CHANNEL_ORDER_BIPOLAR_LONGITUDINAL),
+    "bipolar_transverse": [
+        (f"{anode}-{cathode}", [(anode, 1.0), (cathode, -1.0)])
+        for anode, cathode in BIPOLAR_TRANSVERSE_PAIRS
+    ],
+    "temporal_central_parasagittal": _derivations(
+        CHANNEL_ORDER_TEMPORAL_CENTRAL_PARASAGITTAL
+    ),
+}
+
+VIEWER_MONTAGES = ("linked_ears", "centroid", "bipolar_longitudinal")
+
+
+def reference_matrix(montage, ch_names):
+    """Sparse re-referencing matrix of a montage over the given input channels.
+
+    Channel names are matched case-insensitively. Output channels that need an
+    input channel missing from ch_names are left out.
+
+    :param montage: (str) key of MONTAGES.
+    :param ch_names: (list) input channel names, in the row order of the signal.
+    :return: CSR matrix shaped (outputs, inputs) and the output channel names.
+    """
+    lookup = {ch.upper(): i for i, ch in enumerate(ch_names)}
+
+    rows, cols, weights, names = [], [], [], []
+    for name, terms in MONTAGES[montage]:
+        if not all(ch.upper() in lookup for ch, _ in terms):
+            continue
+        for ch, weight in terms:
+            rows.append(len(names))
+            cols.append(lookup[ch.upper()])
+            weights.append(weight)
+        names.append(name)
+
+    # Duplicate entries are summed, e.g. the Cz row of the centroid montage is zero.
+    matrix = sparse.coo_matrix(
+        (weights, (rows, cols)), shape=(len(names), len(ch_names)), dtype=np.float32
+    ).tocsr()
+    return matrix, names
+
+
+def _to_dataframe(data, ch_names, sample_rate):
+    df = pd.DataFrame(data.T, columns=ch_names)
+    df.insert(0, "time", np.arange(data.shape[1]) / sample_rate)
+    return df
+
+
+class MontageGraph(Mapping):
+    """Viewer DataFrames of each montage, built the first time they are asked for.
+
+    The EEG and ECG channels are downsampled once, on first access, to a float32
+    array in uV. Every montage is then a single sparse matrix product on it,
+    memoized, instead of a copy, a MNE re-reference and a resample per montage.
+    Resampling is linear, so the result matches re-referencing before
+    downsampling.
+
+    Each montage comes with a min/max decimation pyramid (dsp.pyramid), for
+    zoomed-out views, and per-channel amplitude statistics, for scaling, both
+    computed when the montage is built.
+
+    With prefetch, building a montage starts building the next one of
+    VIEWER_MONTAGES in a background thread.
+    """
+
+    def __init__(self, raw, montages=VIEWER_MONTAGES, sample_rate=50, prefetch=True):
+        """
+        :param raw: (mne.io.Raw) filtered recording, left unchanged.
+        :param montages: (tuple) keys of MONTAGES exposed by the mapping.
+        :param sample_rate: (float) sampling rate of the DataFrames.
+        :param prefetch: (bool) build the next montage in the background.
+        """
+        self.raw = raw
+        self.montages = tuple(montages)
+        self.sample_rate = sample_rate
+        self.prefetch = prefetch
+
+        self._signal = None
+        self._ecg = None
+        self._graphs = {}
+        self._pyramids = {}
+        self._stats = {}
+        self._prefetching = set()
+        self._lock = threading.RLock()
+
+    def __contains__(self, montage):
+        # Mapping would build the montage to answer membership
+        return montage in self.montages
+
+    def __iter__(self):
+        return iter(self.montages)
+
+    def __len__(self):
+        return len(self.montages)
+
+    def __getitem__(self, montage):
+        if montage not in self.montages:
+            raise KeyError(montage)
+        graph = self._build(montage)
+        if self.prefetch:
+            self._prefetch_next(montage)
+        return graph
+
+    def pyramid(self, montage):
+        """Min/max decimation pyramid of a montage, see dsp.pyramid.MinMaxPyramid."""
+        if montage not in self.montages:
+            raise KeyError(montage)
+        self._build(montage)
+        with self._lock:
+            return self._pyramids[montage]
+
+    def stats(self, montage):
+        """Per-channel extrema statistics of a montage, see dsp.graph_preprocessing.channel_extrema_stats."""
+        if montage not in self.montages:
+            raise KeyError(montage)
+        self._build(montage)
+        with self._lock:
+            return self._stats[montage]
+
+    @property
+    def duration(self):
+        """Time of the last sample of the montage DataFrames in seconds, without building them."""
+        n_times = int(round(self.raw.n_times * self.sample_rate / self.raw.info["sfreq"]))
+        return (n_times - 1) / self.sample_rate
+
+    def is_built(self, montage):
+        with self._lock:
+            return montage in self._graphs
+
+    @property
+    def ecg(self):
+        """ECG DataFrame, None when the recording has no ECG channel."""
+        with self._lock:
+            if self._signal is None:
+                self._load()
+            return self._ecg
+
+    def _build(self, montage):
+        with self._lock:
+            if montage not in self._graphs:
+                if self._signal is None:
+                    self._load()
+                eeg, eeg_names = self._signal
+                matrix, names = reference_matrix(montage, eeg_names)
+                data = matrix @ eeg
+                self._pyramids[montage] = MinMaxPyramid(data, names, self.sample_rate)
+                self._stats[montage] = channel_extrema_stats(data, names)
+                self._graphs[montage] = _to_dataframe(data, names, self.sample_rate)
+            return self._graphs[montage]
+
+    def _load(self):
+        raw = self.raw
+        ecg_names = [ch for ch in raw.ch_names if ch in ECG_CHANNELS]
+        eeg_picks = [
+            i
+            for i in mne.pick_types(raw.info, eeg=True, exclude=[])
+            if raw.ch_names[i] not in ECG_CHANNELS
+        ]
+        picks = eeg_picks + [raw.ch_names.index(ch) for ch in ecg_names]
+
+        # Same FFT resampling as mne.io.Raw.resample. Volts to uV by hand, since
+        # get_data only takes a single unit when the ECG has the ecg type.
+        signal = mne.filter.resample(
+            raw.get_data(picks=picks) * 1e6,
+            up=self.sample_rate,
+            down=raw.info["sfreq"],
+            npad="auto",
+            window="boxcar",
+            pad="reflect_limited",
+        ).astype(np.float32)
+
+        n_eeg = len(eeg_picks)
+        self._signal = (signal[:n_eeg], [raw.ch_names[i] for i in eeg_picks])
+        self._ecg = (
+            _to_dataframe(signal[n_eeg:], ecg_names, self.sample_rate)
+            if ecg_names
+            else None
+        )
+
+    def _prefetch_next(self, montage):
+        upcoming = self.montages[self.montages.index(montage) + 1 :]
+        with self._lock:
+            upcoming = [
+                m for m in upcoming if m not in self._graphs and m not in self._prefetching
+            ]
+            if not upcoming:
+                return
+            self._prefetching.add(upcoming[0])
+
+        threading.Thread(
+            target=self._build_quietly, args=(upcoming[0],), daemon=True
+        ).start()
+
+    def _build_quietly(self, montage):
+        try:
+            self._build(montage)
+        except Exception:
+            log.exception("Prefetching the %s montage failed", montage)
+        finally:
+            with self._lock:
+                self._prefetching.discard(montage)
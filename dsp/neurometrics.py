@@ -1,6 +1,52 @@
 import numpy as np
 from scipy.integrate import simps
 
+CHANNEL_ORDER_EEG = (
+    "Fp1",
+    "Fp2",
+    "F3",
+    "F4",
+    "C3",
+    "C4",
+    "P3",
+    "P4",
+    "O1",
+    "O2",
+    "F7",
+    "F8",
+    "T3",
+    "T4",
+    "T5",
+    "T6",
+    "Fz",
+    "Cz",
+    "Pz",
+)
+
+SELECTED_CHANNELS = (
+    "Fp1",
+    "Fp2",
+    "F3",
+    "F4",
+    "T5",
+    "T6",
+    "P3",
+    "P4",
+    "O1",
+    "O2",
+    "Fz",
+    "Pz",
+)
+
+TOTAL_RANGE = (2.2, 25)
+
+BANDS = {
+    "delta": (2.2, 4),
+    "theta": (4, 8),
+    "alpha": (8, 13),
+    "beta": (13, 25),
+}
+
 
 def get_power(psd, freqs, f_range=[8, 13]):
     """Calculate the ratio between a frequency range and total (0-100 Hz)
@@ -11,45 +57,8 @@ def get_power(psd, freqs, f_range=[8, 13]):
     :return: delta relative power, expressed as a ratio.
     """
 
-    channel_order_eeg = (
-        "Fp1",
-        "Fp2",
-        "F3",
-        "F4",
-        "C3",
-        "C4",
-        "P3",
-        "P4",
-        "O1",
-        "O2",
-        "F7",
-        "F8",
-        "T3",
-        "T4",
-        "T5",
-        "T6",
-        "Fz",
-        "Cz",
-        "Pz",
-    )
-
-    selected_channels = [
-        "Fp1",
-        "Fp2",
-        "F3",
-        "F4",
-        "T5",
-        "T6",
-        "P3",
-        "P4",
-        "O1",
-        "O2",
-        "Fz",
-        "Pz",
-    ]
-
     selected_indices = [
-        channel_order_eeg.index(channel) for channel in selected_channels
+        CHANNEL_ORDER_EEG.index(channel) for channel in SELECTED_CHANNELS
     ]
 
     psd = psd[selected_indices, :]
@@ -65,3 +74,57 @@ def get_power(psd, freqs, f_range=[8, 13]):
     total_power = total_power[total_power != 0]
 
     return sum(band_power / total_power)
+
+
+def _simpson_weights(freqs, f_range):
+    """Simpson integration weights over the frequencies within f_range, zero elsewhere.
+
+    simps is linear in its input, so integrating an identity matrix yields the
+    weight each bin receives, whichever rule the installed scipy applies.
+    """
+    fl, fh = f_range
+    band_idx = np.where((freqs >= fl) & (freqs <= fh))[0]
+
+    weights = np.zeros(len(freqs))
+    if band_idx.size:
+        weights[band_idx] = simps(np.eye(band_idx.size), dx=freqs[1] - freqs[0])
+    return weights
+
+
+def get_band_powers(psds, freqs, bands=None):
+    """Calculate relative band power for every epoch in a single contraction.
+
+    Batched equivalent of get_power: the channel selection and integration
+    weights are built once and applied to the whole PSD cube.
+
+    :param psds: (numpy.ndarray) power spectral densities, shaped (epochs, channels, freqs).
+    :param freqs: (numpy.ndarray) frequencies
+    :param bands: (dict) band name -> (low, high) Hz, defaults to BANDS.
+    :return: (numpy.ndarray) relative power ratios, shaped (epochs, bands).
+    """
+    bands = BANDS if bands is None else bands
+
+    selected_indices = [
+        CHANNEL_ORDER_EEG.index(channel) for channel in SELECTED_CHANNELS
+    ]
+
+    # One column per band plus a last column for the total power.
+    weights = np.stack(
+        [_simpson_weights(freqs, f_range) for f_range in bands.values()]
+        + [_simpson_weights(freqs, TOTAL_RANGE)],
+        axis=1,
+    )
+
+    powers = np.einsum(
+        "ecf,fb->ecb", psds[:, selected_indices, :], weights, optimize=True
+    )
+    band_power, total_power = powers[..., :-1], powers[..., -1:]
+
+    # Channels without power are skipped, as in get_power.
+    ratios = np.divide(
+        band_power,
+        total_power,
+        out=np.zeros_like(band_power),
+        where=(band_power != 0) & (total_power != 0),
+    )
+    return ratios.sum(axis=1)
@@ -0,0 +1,97 @@
+"""
+Array-wide peak detection.
+
+Mirrors the behaviour of scipy.signal.find_peaks (no conditions) and
+scipy.signal.peak_prominences (no window), but works on every row of an
+N-dimensional array at once instead of one 1-D signal at a time.
+"""
+
+import numpy as np
+
+
+def local_maxima(x):
+    """Find local maxima along the last axis of an array.
+
+    Flat peaks (plateaus) are resolved to their middle sample, rounding down,
+    and samples at either edge are never maxima, exactly like find_peaks.
+
+    :param x: (numpy.ndarray) signals, local maxima are searched along the last axis.
+    :return: (numpy.ndarray) boolean mask with the same shape as x.
+    """
+    x = np.asarray(x)
+    mask = np.zeros(x.shape, dtype=bool)
+    n = x.shape[-1]
+    if n < 3 or x.size == 0:
+        return mask
+
+    if not np.any(x[..., 1:] == x[..., :-1]):
+        # Without plateaus a maximum is simply above both of its neighbours.
+        centre = x[..., 1:-1]
+        mask[..., 1:-1] = (centre > x[..., :-2]) & (centre > x[..., 2:])
+        return mask
+
+    rows = x.reshape(-1, n)
+    flat = rows.ravel()
+
+    # Collapse every plateau into a run, runs never cross row boundaries.
+    run_start = np.ones(rows.shape, dtype=bool)
+    run_start[:, 1:] = rows[:, 1:] != rows[:, :-1]
+    starts = np.flatnonzero(run_start)
+    ends = np.append(starts[1:], flat.size) - 1
+
+    values = flat[starts]
+    has_left = starts % n != 0
+    has_right = ends % n != n - 1
+
+    left = np.empty_like(values)
+    left[1:] = values[:-1]
+    right = np.empty_like(values)
+    right[:-1] = values[1:]
+
+    is_peak = has_left & has_right
+    is_peak[is_peak] &= (left[is_peak] < values[is_peak]) & (
+        right[is_peak] < values[is_peak]
+    )
+
+    mask.reshape(-1)[(starts[is_peak] + ends[is_peak]) // 2] = True
+    return mask
+
+
+def prominences(x, maxima):
+    """Calculate the prominence of every local maximum along the last axis.
+
+    Meant for short signals (e.g. a band of PSD bins), the bases are searched
+    with one vectorized pass per bin offset.
+
+    :param x: (numpy.ndarray) signals, as passed to local_maxima.
+    :param maxima: (numpy.ndarray) boolean mask returned by local_maxima.
+    :return: (numpy.ndarray) prominences at the maxima, NaN everywhere else.
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.shape[-1]
+
+    left_min = x.copy()
+    right_min = x.copy()
+    left_open = np.ones(x.shape, dtype=bool)
+    right_open = np.ones(x.shape, dtype=bool)
+
+    # Walk away from every sample until a higher sample (or the edge) is hit,
+    # keeping track of the lowest sample seen on the way.
+    for d in range(1, n):
+        left_open[..., d:] &= x[..., :-d] <= x[..., d:]
+        left_open[..., :d] = False
+        left_min[..., d:] = np.where(
+            left_open[..., d:],
+            np.minimum(left_min[..., d:], x[..., :-d]),
+            left_min[..., d:],
+        )
+
+        right_open[..., :-d] &= x[..., d:] <= x[..., :-d]
+        right_open[..., -d:] = False
+        right_min[..., :-d] = np.where(
+            right_open[..., :-d],
+            np.minimum(right_min[..., :-d], x[..., d:]),
+            right_min[..., :-d],
+        )
+
+    return np.where(maxima, x - np.maximum(left_min, right_min), np.nan)
@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class MinMaxPyramid:
+    """Min/max decimation pyramid of a multichannel signal, for zoomed-out views.
+
+    Level k keeps the minimum and maximum of every bucket of factor**k samples,
+    in float32. Plotting the min and max of each bucket keeps spikes and
+    artifacts visible at any zoom level, with a bounded number of points.
+    """
+
+    def __init__(self, signal, ch_names, sfreq, t0=0.0, factor=4, min_buckets=256):
+        """
+        :param signal: (numpy.ndarray) signal shaped (channels, times).
+        :param ch_names: (list) channel names, in the row order of signal.
+        :param sfreq: (float) sampling frequency.
+        :param t0: (float) time of the first sample, in seconds.
+        :param factor: (int) samples per bucket ratio between consecutive levels.
+        :param min_buckets: (int) the coarsest level keeps at least this many buckets.
+        """
+        self.ch_names = list(ch_names)
+        self.sfreq = sfreq
+        self.t0 = t0
+        self.n_times = signal.shape[1]
+
+        # (bucket size in samples, mins, maxs), finest level first
+        self.levels = []
+        bucket, mins, maxs = 1, signal, signal
+        while -(-mins.shape[1] // factor) >= min_buckets:
+            edges = np.arange(0, mins.shape[1], factor)
+            mins = np.minimum.reduceat(mins, edges, axis=1).astype(np.float32)
+            maxs = np.maximum.reduceat(maxs, edges, axis=1).astype(np.float32)
+            bucket *= factor
+            self.levels.append((bucket, mins, maxs))
+
+    @classmethod
+    def from_dataframe(cls, df, sfreq, **kwargs):
+        """Pyramid of every column of a viewer DataFrame but time."""
+        channels = df.columns.drop("time")
+        return cls(
+            df[channels].to_numpy(dtype=np.float32).T,
+            channels,
+            sfreq,
+            t0=float(df["time"].iloc[0]),
+            **kwargs,
+        )
+
+    @property
+    def nbytes(self):
+        return sum(mins.nbytes + maxs.nbytes for _, mins, maxs in self.levels)
+
+    def level_for(self, start, end, max_points):
+        """Finest level drawing [start, end] with at most max_points points per channel.
+
+        :return: index in levels, None when raw samples already fit.
+        """
+        n_samples = (end - start) * self.sfreq
+        if n_samples <= max_points or not self.levels:
+            return None
+        for i, (bucket, _, _) in enumerate(self.levels):
+            if 2 * n_samples / bucket <= max_points:
+                return i
+        return len(self.levels) - 1
+
+    def query(self, start, end, max_points, channels=None):
+        """Min/max envelope of [start, end] at the level matching max_points.
+
+        Each bucket contributes its minimum then its maximum.
+
+        :param start: (float) first time in seconds.
+        :param end: (float) last time in seconds.
+        :param max_points: (int) points per channel, about twice the plot width in pixels.
+        :param channels: (list) channels to return, defaults to all of them.
+        :return: times and values shaped (channels, points), None when raw samples fit.
+        """
+        level = self.level_for(start, end, max_points)
+        if level is None:
+            return None
+        bucket, mins, maxs = self.levels[level]
+
+        first = max(int((start - self.t0) * self.sfreq // bucket), 0)
+        last = min(int(-(-(end - self.t0) * self.sfreq // bucket)), mins.shape[1])
+        channels = self.ch_names if channels is None else channels
+        rows = [self.ch_names.index(ch) for ch in channels]
+
+        values = np.empty((len(rows), 2 * (last - first)), dtype=np.float32)
+        values[:, 0::2] = mins[rows, first:last]
+        values[:, 1::2] = maxs[rows, first:last]
+
+        onsets = self.t0 + np.arange(first, last) * bucket / self.sfreq
+        times = np.repeat(onsets, 2)
+        times[1::2] += bucket / (2 * self.sfreq)
+        return times, values
@@ -23,7 +23,12 @@ def event_to_list(select_event=None, ordered_channels=None):
     if "current_montage" not in st.session_state:
         st.session_state.current_montage = "linked ears"
 
-    onsets = select_event["selection"].get("points", [])
+    # Only points of the selection trace, their customdata is the channel row
+    onsets = [
+        point
+        for point in select_event["selection"].get("points", [])
+        if "customdata" in point
+    ]
     aea = st.session_state.get("aea", None)
 
     if aea is not None and not aea[st.session_state.current_montage].empty:
@@ -36,7 +41,7 @@ def event_to_list(select_event=None, ordered_channels=None):
                 point["x"],
                 float_to_full_timestamp(point["x"]),
                 get_probability(point["x"], aea_df),
-                ordered_channels[point["curve_number"]],
+                ordered_channels[point_channel(point)],
                 st.session_state.ref_selectbox,
                 "",
                 st.session_state.user,
@@ -51,7 +56,7 @@ def event_to_list(select_event=None, ordered_channels=None):
                 point["x"],
                 float_to_full_timestamp(point["x"]),
                 0.0, # Since no ML AEA onsets provided
-                ordered_channels[point["curve_number"]],
+                ordered_channels[point_channel(point)],
                 st.session_state.ref_selectbox,
                 "",
                 st.session_state.user,
@@ -62,6 +67,24 @@ def event_to_list(select_event=None, ordered_channels=None):
     return selection_list
 
 
+def point_channel(point):
+    """
+    Row of the channel a selected point belongs to, from its customdata.
+
+    Parameters:
+    - point: dict
+        A point of a plotly selection event.
+
+    Returns:
+    - channel: int
+        Index of the channel in the ordered channels.
+    """
+    customdata = point["customdata"]
+    if isinstance(customdata, (list, tuple)):
+        customdata = customdata[0]
+    return int(customdata)
+
+
 def convert_point_to_timestamp(point):
     """
     Take in the clicked x point and convert it to a MM:SS value.
@@ -1,112 +1,290 @@
 import pandas as pd
 import datetime
-import math
 
+import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
 
 
-def draw_eeg_graph(df, ref, channels, sfreq=50, offset_value=1.0):
-    def format_seconds(seconds):
-        # Convert seconds to timedelta
-        td = datetime.timedelta(seconds=seconds)
-        # Get minutes and seconds
-        minutes, seconds = divmod(td.seconds, 60)
-        # Extract milliseconds from timedelta
-        milliseconds = td.microseconds // 1000
-        return f"{minutes:02}:{seconds:02}"  # .{milliseconds:03}"
+def window_slice(times, start, end):
+    """
+    Rows of a sorted time column inside [start, end], found by binary search.
 
-    # Create tick labels in desired format
-    tick_vals = df[df["time"] % 1.0 == 0.0]["time"].values  # Original values in seconds
-    tick_text = [format_seconds(x) for x in tick_vals]  # Formatted as MM:SS.SSS
+    :param times: (numpy.ndarray) sorted sample times in seconds.
+    :param start: (float) first time of the window.
+    :param end: (float) last time of the window.
+    :return: (slice) positional slice of the rows in the window.
+    """
+    first = np.searchsorted(times, start, side="left")
+    last = np.searchsorted(times, end, side="right")
+    return slice(int(first), int(last))
 
-    # Initialize fig object
-    fig = go.Figure()
 
-    # Add traces to fig
-    for i, channel in enumerate(channels):
-        offset = i * offset_value
-        fig.add_trace(
-            go.Scattergl(
-                x=df["time"],
-                y=df[channel] + offset,
-                mode="lines+markers",
-                name=channel,
-                line=dict(
-                    color="#4E4E4E",
-                    width=0.8,
-                ),
-                marker=dict(
-                    size=2,
-                    opacity=0.01,
-                    color="#4E4E4E",
-                ),
-            )
+def merge_intervals(starts, ends):
+    """
+    Merge overlapping or touching intervals with a vectorized run-length merge.
+
+    :param starts: (numpy.ndarray) interval starts.
+    :param ends: (numpy.ndarray) interval ends.
+    :return: starts and ends of the merged intervals, sorted.
+    """
+    order = np.argsort(starts, kind="stable")
+    starts, ends = np.asarray(starts)[order], np.asarray(ends)[order]
+    if len(starts) == 0:
+        return starts, ends
+
+    # Furthest end reached so far, a new run starts past it
+    reach = np.maximum.accumulate(ends)
+    new_run = np.r_[True, starts[1:] > reach[:-1]]
+    run_ends = np.r_[np.flatnonzero(new_run)[1:] - 1, len(starts) - 1]
+    return starts[new_run], reach[run_ends]
+
+
+def interval_shapes(onsets, y_range, x_range, color, opacity, duration=2.0):
+    """
+    Rectangles of the merged [onset, onset + duration] intervals inside x_range,
+    drawn below the traces.
+
+    :param onsets: (array) interval onsets in seconds.
+    :param y_range: (tuple) bottom and top of the rectangles.
+    :param x_range: (tuple) only onsets inside it are drawn.
+    :param color: (str) fill color.
+    :param opacity: (float) fill opacity.
+    :param duration: (float) interval length in seconds.
+    :return: list of plotly layout shapes.
+    """
+    onsets = np.asarray(onsets, dtype=float)
+    onsets = onsets[(onsets >= x_range[0]) & (onsets <= x_range[1])]
+    starts, ends = merge_intervals(onsets, onsets + duration)
+
+    return [
+        dict(
+            type="rect",
+            x0=start,
+            x1=end,
+            y0=y_range[0],
+            y1=y_range[1],
+            fillcolor=color,
+            opacity=opacity,
+            layer="below",  # draw below the data
+            line_width=0,
         )
+        for start, end in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+def overlay_shapes(ref, n_channels, x_range, offset_value=1.0):
+    """
+    Shapes of the overlays enabled in the session (ML onsets, autoreject, your
+    onsets), as merged intervals below the EEG traces.
+
+    :param ref: (str) montage name.
+    :param n_channels: (int) number of channel rows of the figure.
+    :param x_range: (tuple) first and last time served to the figure.
+    :param offset_value: (float) distance between channel rows.
+    :return: list of plotly layout shapes.
+    """
+    offset = (n_channels - 1) * offset_value
+    y_range = (-150, offset * n_channels)
+    served = (x_range[0] - 2, x_range[1])
+    shapes = []
 
-    # Use a form to contain the data editor and submit button
-    # Retrieve ahr from session state
     if st.session_state.highlight_ml_onsets:
         aea = st.session_state.get("aea", None)
 
         if aea is not None:
             if not aea[ref].empty:
-                abnormal_epochs = st.session_state.aea[ref][
-                    st.session_state.aea[ref]["is_seizure"] == True
-                ]["onsets"]
-                for onset in abnormal_epochs:
-                    fig.add_shape(
-                        # adding a Rectangle for seizure epoch
-                        type="rect",
-                        x0=onset,  # start time of seizure
-                        x1=onset + 2,  # end time of seizure (2 seconds after start)
-                        y0=-150,  # start y (adjust according to your scale)
-                        y1=offset * len(channels),  # end y
-                        fillcolor="#FF7373",
-                        opacity=0.2,  # transparency, og: 0.9
-                        layer="below",  # draw below the data
-                        line_width=0,
-                    )
+                abnormal_epochs = aea[ref][aea[ref]["is_seizure"] == True]["onsets"]
+                shapes += interval_shapes(
+                    abnormal_epochs, y_range, served, "#FF7373", 0.2
+                )
 
     autoreject = st.session_state.get("autoreject", None)
 
     if autoreject is not None:
         if ref != "bipolar_longitudinal":
             if not autoreject[ref].empty:
-                bad_epochs = st.session_state.autoreject[ref]["onsets"]
-                for onset in bad_epochs:
-                    fig.add_shape(
-                        # adding a Rectangle for seizure epoch
-                        type="rect",
-                        x0=onset,  # start time of seizure
-                        x1=onset + 2,  # end time of seizure (2 seconds after start)
-                        y0=-150,  # start y (adjust according to your scale)
-                        y1=offset * len(channels),  # end y
-                        fillcolor="#355cac",  # color of the shaded area, og: #5ad1ad
-                        opacity=0.1,  # transparency
-                        layer="below",  # draw below the data
-                        line_width=0,
-                    )
-
+                shapes += interval_shapes(
+                    autoreject[ref]["onsets"], y_range, served, "#355cac", 0.1
+                )
 
     if st.session_state.highlight_your_onsets:
-        onsets = st.session_state.selected_onsets[['point_x']].values.tolist()
+        onsets = np.floor(st.session_state.selected_onsets["point_x"].to_numpy(float))
         if len(onsets) > 0:
-            for onset in st.session_state.selected_onsets[['point_x']].values.tolist():
-                onset = float(math.floor(onset[0]))
-                fig.add_shape(
-                    # adding a Rectangle for seizure epoch
-                    type="rect",
-                    x0=onset,  # start time of seizure
-                    x1=onset + 2.0,  # end time of seizure (2 seconds after start)
-                    y0=-150,  # start y (adjust according to your scale)
-                    y1=offset * len(channels),  # end y
-                    fillcolor="#7e35ac",  # color of the shaded area, og: #5ad1ad
-                    opacity=0.1,  # transparency
-                    layer="below",  # draw below the data
-                    line_width=0,
-                )
+            shapes += interval_shapes(onsets, y_range, served, "#7e35ac", 0.1)
+
+    return shapes
+
+
+def _trace_values(values, scale, offset_value, precision=3):
+    """Scaled values of every channel shifted to its row, rounded to precision decimals."""
+    offsets = np.arange(len(values))[:, None] * offset_value
+    return np.round(values.astype(np.float64) * scale + offsets, precision)
+
+
+def eeg_traces(times, values, scale=1.0, offset_value=1.0, hit_step=10):
+    """
+    Line-only traces of every channel, plus one sparse marker trace for selection.
+
+    Line traces carry no time column, sample times are given by x0 and dx.
+    Selection uses a single marker trace on top of the signal, every hit_step
+    points, whose customdata is the channel row (see
+    graph_helpers.eeg_viewer_helper.event_to_list). Values are rounded to
+    1e-3 of the channel offset, well below a pixel, which keeps the JSON
+    payload short.
+
+    :param times: (numpy.ndarray) evenly spaced sample times in seconds.
+    :param values: (numpy.ndarray) unscaled values shaped (channels, times).
+    :param scale: (float) scaling of the values.
+    :param offset_value: (float) distance between channel rows.
+    :param hit_step: (int) one selectable point every hit_step points of a channel.
+    :return: list of the channel traces followed by the selection trace.
+    """
+    n_channels, n_times = values.shape
+    values = _trace_values(values, scale, offset_value)
+
+    dx = times[1] - times[0] if n_times > 1 else 1.0
+    if np.allclose(np.diff(times), dx):
+        x = dict(x0=times[0], dx=dx)
+    else:
+        x = dict(x=times)
+
+    traces = [
+        go.Scattergl(
+            y=row,
+            mode="lines",
+            line=dict(
+                color="#4E4E4E",
+                width=0.8,
+            ),
+            hoverinfo="skip",
+            showlegend=False,
+            **x,
+        )
+        for row in values
+    ]
+
+    hits = np.arange(0, n_times, hit_step)
+    traces.append(
+        go.Scattergl(
+            x=np.tile(np.round(times[hits], 3), n_channels),
+            y=values[:, hits].ravel(),
+            customdata=np.repeat(np.arange(n_channels, dtype=np.int16), len(hits)),
+            mode="markers",
+            name="Selection",
+            marker=dict(
+                size=4,
+                opacity=0.01,
+                color="#4E4E4E",
+            ),
+            hovertemplate="%{x:.2f} s<extra></extra>",
+            showlegend=False,
+        )
+    )
+    return traces
+
+
+def rescale_eeg_traces(fig, values, scale, offset_value=1.0, hit_step=10):
+    """
+    Rescale the traces made by eeg_traces in place, the rest of the figure is kept.
+
+    :param fig: (plotly.graph_objects.Figure) figure whose first traces come from eeg_traces.
+    :param values: (numpy.ndarray) the unscaled values the traces were made from.
+    :param scale: (float) new scaling of the values.
+    """
+    values = _trace_values(values, scale, offset_value)
+    hits = np.arange(0, values.shape[1], hit_step)
+    with fig.batch_update():
+        for trace, row in zip(fig.data, values):
+            trace.y = row
+        fig.data[len(values)].y = values[:, hits].ravel()
+
+
+def draw_eeg_graph(df, ref, channels, **kwargs):
+    """
+    Plotly figure of the EEG traces of a montage, see build_eeg_graph.
+    """
+    return build_eeg_graph(df, ref, channels, **kwargs)[0]
+
+
+def build_eeg_graph(
+    df,
+    ref,
+    channels,
+    sfreq=50,
+    offset_value=1.0,
+    window=None,
+    margin=10.0,
+    pyramid=None,
+    scale=1.0,
+    max_points=4000,
+    hit_step=10,
+):
+    """
+    Plotly figure of the EEG traces of a montage, see eeg_traces.
+
+    :param df: (pandas.DataFrame) montage DataFrame with a time column.
+    :param ref: (str) montage name.
+    :param channels: (list) channels to draw, bottom trace first.
+    :param window: (tuple) visible (start, end) in seconds. Only the window and
+        a prefetch margin on each side are sent to the browser. None sends the
+        whole recording.
+    :param margin: (float) seconds of data sent on each side of the window.
+    :param pyramid: (dsp.pyramid.MinMaxPyramid) decimation pyramid of the montage.
+        Visible spans with more than max_points samples are drawn from it.
+    :param scale: (float) scaling of the EEG values, e.g. 0.1 / sensitivity in uV.
+    :param max_points: (int) points per trace across the visible span, about
+        twice the plot width in pixels.
+    :param hit_step: (int) one selectable point every hit_step points of a channel.
+    :return: the figure and the unscaled values of its EEG traces, for rescaling.
+    """
+    def format_seconds(seconds):
+        # Convert seconds to timedelta
+        td = datetime.timedelta(seconds=seconds)
+        # Get minutes and seconds
+        minutes, seconds = divmod(td.seconds, 60)
+        # Extract milliseconds from timedelta
+        milliseconds = td.microseconds // 1000
+        return f"{minutes:02}:{seconds:02}"  # .{milliseconds:03}"
+
+    if window is None:
+        visible = [0.0, 20.0]
+    else:
+        visible = list(window)
+        served = window_slice(
+            df["time"].to_numpy(), window[0] - margin, window[1] + margin
+        )
+        df = df.iloc[served]
+
+    x_start, x_end = df["time"].iloc[0], df["time"].iloc[-1]
+
+    # Create tick labels in desired format
+    tick_vals = df[df["time"] % 1.0 == 0.0]["time"].values  # Original values in seconds
+    tick_text = [format_seconds(x) for x in tick_vals]  # Formatted as MM:SS.SSS
+
+    # Initialize fig object
+    fig = go.Figure()
 
+    # Zoomed out spans are drawn from the min/max envelope instead of raw samples.
+    # The level follows the visible span, not the served one: with the whole
+    # recording served, the initial view is still drawn at full resolution.
+    served_points = max_points * max((x_end - x_start) / (visible[1] - visible[0]), 1.0)
+    envelope = None
+    if pyramid is not None and len(df) > served_points:
+        envelope = pyramid.query(x_start, x_end, served_points, channels)
+
+    if envelope is None:
+        times = df["time"].to_numpy()
+        values = df[list(channels)].to_numpy(dtype=np.float32).T
+    else:
+        times, values = envelope
+
+    # Add traces to fig
+    fig.add_traces(
+        eeg_traces(times, values, scale, offset_value, hit_step=hit_step)
+    )
+    # Overlays are layout shapes, replaced without rebuilding the traces
+    shapes = overlay_shapes(ref, len(channels), (x_start, x_end), offset_value)
 
     # Create custom y-axis tick labels and positions
     yticks = [i * offset_value for i in range(len(channels))]
@@ -115,14 +293,15 @@ def draw_eeg_graph(df, ref, channels, sfreq=50, offset_value=1.0):
     # Format the fig
     fig.update_layout(
         # title="",
+        shapes=shapes,
         xaxis=dict(
             # domain=[0.0, 1.0],
             rangeslider=dict(
                 visible=True,
                 thickness=0.06,  # adjust thickness (0.1 means 10% of the plot height)
-                range=[0.0, df["time"].iloc[-1]],  # range of beginning to end
+                range=[x_start, x_end],  # range of the data sent
             ),
-            range=[0.0, 20.0],
+            range=visible,
             tickvals=df[df["time"] % 1.0 == 0.0]["time"].values,
             ticktext=tick_text,
             showgrid=True,
@@ -145,4 +324,64 @@ def draw_eeg_graph(df, ref, channels, sfreq=50, offset_value=1.0):
         margin=dict(t=20, l=0, r=0, b=5),
     )
 
-    return fig
+    return fig, values
+
+
+class EEGFigureCache:
+    """
+    Last EEG figure of a session, rescaled in place when only the scale changes.
+
+    A sensitivity change rewrites the y values of the EEG traces, and an
+    overlay change replaces the layout shapes, instead of rebuilding the figure.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.fig = None
+        self.values = None
+        self.scale = None
+        self.offset_value = None
+        self.hit_step = None
+        self.shapes = None
+
+    def figure(self, key, graph, ref, channels, scale=1.0, **kwargs):
+        """
+        Figure of build_eeg_graph, reused while key is unchanged.
+
+        :param key: (tuple) everything the traces depend on but the scale,
+            e.g. recording, montage and window. Overlays are read from the
+            session on every call, see overlay_shapes.
+        :param graph: (dsp.montages.MontageGraph) montages of the recording, only
+            read when the figure is built: the montage DataFrame and its pyramid.
+        """
+        if key != self.key:
+            self.fig, self.values = build_eeg_graph(
+                graph[ref],
+                ref,
+                channels,
+                scale=scale,
+                pyramid=graph.pyramid(ref),
+                **kwargs,
+            )
+            self.key, self.scale = key, scale
+            self.offset_value = kwargs.get("offset_value", 1.0)
+            self.hit_step = kwargs.get("hit_step", 10)
+            self.shapes = self._overlays(ref, channels)
+            return self.fig
+
+        if scale != self.scale:
+            rescale_eeg_traces(
+                self.fig, self.values, scale, self.offset_value, self.hit_step
+            )
+            self.scale = scale
+
+        shapes = self._overlays(ref, channels)
+        if shapes != self.shapes:
+            self.fig.layout.shapes = shapes
+            self.shapes = shapes
+        return self.fig
+
+    def _overlays(self, ref, channels):
+        # Served time range of the figure, see build_eeg_graph
+        x_range = self.fig.layout.xaxis.rangeslider.range
+        return overlay_shapes(ref, len(channels), x_range, self.offset_value)
@@ -0,0 +1,256 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.ticker import FuncFormatter
+from scipy.signal import welch
+
+from utils.graph_utils import smooth_psd
+from utils.helpers import format_func
+
+log = logging.getLogger(__name__)
+
+LINECOLOR = "slategray"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _stack_rows(values, lower=None, upper=None, height=0.8):
+    """Scale every row into its own band of a shared axis, first row on top.
+
+    Each row is stretched between its own limits, like a separate autoscaled
+    subplot per channel would show it.
+    """
+    n_rows = values.shape[0]
+    lower = values.min(axis=1) if lower is None else lower
+    upper = values.max(axis=1) if upper is None else upper
+    span = np.where(upper > lower, upper - lower, 1.0)
+
+    baselines = np.arange(n_rows)[::-1] + (1 - height) / 2
+    scaled = (values - lower[:, None]) / span[:, None]
+    return baselines[:, None] + height * scaled, baselines, lower, span
+
+
+def draw_epoch_figure(data, fs, event_start, channels, plot_title):
+    """Draw an epoch's time series next to the PSD of each channel.
+
+    All traces of a panel are drawn as a single collection on one axis, instead
+    of one subplot per channel.
+
+    :param data: (numpy.ndarray) epoch in uV, shaped (channels, times), first channel on top.
+    :param fs: (float) sampling frequency.
+    :param event_start: (float) epoch onset in seconds.
+    :param channels: (list) channel labels, in the order of data.
+    :param plot_title: (str) figure title.
+    :return: matplotlib.figure.Figure
+    """
+    n_rows, n_samples = data.shape
+    n_seconds = n_samples / fs
+    tmin = 0.0
+    tmax = (n_samples - 1) / fs
+    t = np.linspace(event_start, event_start + n_seconds, n_samples)
+
+    fig = plt.figure(figsize=(24, 9))
+    gs = fig.add_gridspec(1, 2, width_ratios=[2, 1], wspace=0.05)
+    ax_time = fig.add_subplot(gs[0, 0])
+    ax_fft = fig.add_subplot(gs[0, 1])
+
+    fig.text(
+        0.14,
+        0.99,
+        plot_title,
+        fontsize=34,
+        fontweight="bold",
+        va="top",
+        ha="left",
+        **{"fontname": "DejaVu Sans"},
+    )
+
+    # Time series panel
+    traces, baselines, lower, span = _stack_rows(data)
+    ax_time.add_collection(
+        LineCollection(
+            [np.column_stack((t, trace)) for trace in traces], colors="k"
+        )
+    )
+    ax_time.vlines(
+        np.arange(event_start, event_start + n_seconds),
+        0,
+        n_rows,
+        colors=LINECOLOR,
+        linestyles="--",
+        alpha=0.75,
+    )
+
+    # Makes time series amplitude text dyanmic with the width of the plot
+    text_adjust = 20 / n_seconds
+    zero_lines = baselines + 0.8 * (0 - lower) / span
+    eeg_scales = np.round(data.max(axis=1), 1)
+    for i in range(n_rows):
+        ax_time.text(
+            event_start + tmin - 0.6 / text_adjust,
+            zero_lines[i],
+            channels[i],
+            fontweight="regular",
+            fontsize=9,
+            ha="center",
+            **{"fontname": "DejaVu Sans"},
+        )
+        ax_time.text(
+            event_start + tmax + 0.50 / text_adjust,
+            zero_lines[i],
+            f"{eeg_scales[i]} µV",
+            fontweight="regular",
+            fontsize=8,
+            ha="center",
+            **{"fontname": "DejaVu Sans"},
+        )
+
+    # Autoscale margin of the former per-channel plots, the channel names and
+    # amplitude labels sit in it, next to the PSD panel
+    x_margin = plt.rcParams["axes.xmargin"] * (t[-1] - t[0])
+    ax_time.set_xlim(t[0] - x_margin, t[-1] + x_margin)
+    ax_time.set_ylim(0, n_rows)
+    ax_time.set_xlabel("Time (s)")
+    ax_time.set_yticks([])
+    ax_time.xaxis.set_major_formatter(FuncFormatter(format_func))
+
+    # PSD panel, all channels from a single Welch call
+    freqs, psds = welch(data, fs=fs)
+    psds = smooth_psd(psds, window_len=2)
+
+    # Select the range of frequencies of interest
+    psd_ylimits = psds[:, (freqs >= 2.2) & (freqs <= 25)].max(axis=1)
+
+    visible = (freqs >= 0.75) & (freqs <= 25)
+    freqs, psds = freqs[visible], psds[:, visible]
+    psds = np.minimum(psds, psd_ylimits[:, None])
+    curves, baselines, _, _ = _stack_rows(
+        psds, lower=np.zeros(n_rows), upper=psd_ylimits, height=0.9
+    )
+
+    ax_fft.add_collection(
+        PolyCollection(
+            [
+                np.column_stack(
+                    (
+                        np.concatenate(([freqs[0]], freqs, [freqs[-1]])),
+                        np.concatenate(([base], curve, [base])),
+                    )
+                )
+                for curve, base in zip(curves, baselines)
+            ],
+            facecolors="#00FFFF",
+            edgecolors="none",
+        )
+    )
+    ax_fft.add_collection(
+        LineCollection(
+            [np.column_stack((freqs, curve)) for curve in curves],
+            colors="#000000",
+            linewidths=1.5,
+        )
+    )
+    ax_fft.vlines(
+        [4, 8, 13], 0, n_rows, colors=LINECOLOR, linestyles="--", alpha=0.75
+    )
+
+    for i in range(n_rows):
+        ax_fft.text(
+            26.5,
+            baselines[i],
+            f"{round(psd_ylimits[i], 1)}",
+            fontweight="regular",
+            fontsize=8,
+            ha="center",
+            **{"fontname": "DejaVu Sans"},
+        )
+    ax_fft.text(
+        1.00,
+        1.00,
+        "\u03bcV\u00b2/Hz",
+        verticalalignment="top",
+        horizontalalignment="left",
+        transform=ax_fft.transAxes,
+        fontsize=9,
+        bbox=dict(facecolor="none", edgecolor="none", boxstyle="square"),
+    )
+
+    ax_fft.set_xlim([0.75, 25])
+    ax_fft.set_ylim(0, n_rows)
+    ax_fft.set_xlabel("Frequency (Hz)")
+    ax_fft.set_yticks([])
+    ax_fft.set_xticks(np.arange(2, 25, 2))
+
+    for ax in (ax_time, ax_fft):
+        for s in ["top", "right", "left", "bottom"]:
+            ax.spines[s].set_visible(False)
+
+    fig.subplots_adjust(left=0.06, right=0.95, top=0.88, bottom=0.07)
+    return fig
+
+
+def render_epoch_png(figure_args, dpi=200):
+    """Draw an epoch figure with the Agg backend and return it as PNG bytes.
+
+    Runs in worker processes, the savefig options match what st.pyplot uses.
+    """
+    matplotlib.use("Agg")
+    fig = draw_epoch_figure(**figure_args)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers never inherit the Streamlit script thread state.
+            _executor = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, 8),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """Shut a broken pool down, the next render starts a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_epoch_pngs(figure_args):
+    """Render several epoch figures concurrently in a process pool.
+
+    If a worker dies, the pool is discarded and the remaining figures are
+    rendered one by one in this process.
+
+    :param figure_args: (list) draw_epoch_figure keyword arguments, in rank order.
+    :return: generator of PNG bytes, in rank order, each yielded as soon as it is ready.
+    """
+    executor = _get_executor()
+    rendered = 0
+    try:
+        futures = [executor.submit(render_epoch_png, args) for args in figure_args]
+        for future in futures:
+            yield future.result()
+            rendered += 1
+    except BrokenProcessPool:
+        log.exception("Epoch render pool broke, rendering serially")
+        _discard_executor(executor)
+        for args in figure_args[rendered:]:
+            yield render_epoch_png(args)
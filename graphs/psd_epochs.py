@@ -1,9 +1,7 @@
 import numpy as np
 import plotly.graph_objects as go
-import streamlit as st
 
 
-@st.cache_resource
 def psd_peaks_3d(freqs, psd, epochs, alpha_scores):
     # Create a 3D plot
     fig = go.Figure()
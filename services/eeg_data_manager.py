@@ -1,23 +1,28 @@
 import asyncio
 import os
 import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 from mywaveanalytics.libraries import mywaveanalytics, filters
-from mywaveanalytics.libraries.references import (bipolar_longitudinal_montage,
-                                                  bipolar_transverse_montage,
-                                                  centroid)
 from mywaveanalytics.utils import params
 
 from data_models.abnormality_parsers import (serialize_aea_to_pandas,
                                              serialize_ahr_to_pandas,
                                              serialize_autoreject_to_pandas)
 from dsp.analytics import StandardPipeline
+from dsp.montages import MontageGraph
+from services.eeg_file_cache import file_sha256, get_eeg_file_cache
 from services.mywaveplatform_api import MyWavePlatformApi
-from utils.helpers import assign_ecg_channel_type, format_single
+from services.recording_store import RecordingStore, get_recording_store
+from utils.helpers import (assign_ecg_channel_type, format_single,
+                           recording_fingerprint)
+
+# Band-pass cutoffs of load_mw_object, part of the recording store key
+EEG_FILTER_HZ = (1, 25)
 
 
 class EEGDataManager:
@@ -48,7 +53,7 @@ class EEGDataManager:
     def load_mw_object(self, path, eeg_type):
         try:
             mw_object = mywaveanalytics.MyWaveAnalytics(path, None, None, eeg_type)
-            filters.eeg_filter(mw_object, 1, 25)
+            filters.eeg_filter(mw_object, *EEG_FILTER_HZ)
             filters.notch(
                 mw_object
             )
@@ -57,6 +62,42 @@ class EEGDataManager:
             st.error(f"Loading failed for {path}: {e}")
             return None
 
+    def load_recording(self, path, eeg_type, content_hash=None):
+        """
+        Preprocessed recording of an EEG file, from the recording store when any
+        session already loaded the same file.
+
+        :param path: (str) EEG file.
+        :param eeg_type: (int) MyWaveAnalytics file type.
+        :param content_hash: (str) SHA-256 of the file, computed when None.
+        :return: the MyWaveAnalytics object and its recording fingerprint,
+            None and None when loading failed.
+        """
+        store = get_recording_store()
+        key = RecordingStore.key(
+            content_hash or file_sha256(path),
+            eeg_type,
+            ("eeg_filter", EEG_FILTER_HZ),
+            "notch",
+        )
+        mw_object, fingerprint = store.get(key)
+        if mw_object is not None:
+            return mw_object, fingerprint
+
+        mw_object = self.load_mw_object(path, eeg_type)
+        if mw_object is None:
+            return None, None
+        try:
+            stored, fingerprint = store.put(key, mw_object)
+        except Exception as e:
+            # Still usable, only not shared with other sessions
+            st.warning(f"Failed to store the preprocessed recording: {e}")
+            return mw_object, None
+        if stored is None:
+            # Evicted or unreadable right after it was stored
+            return mw_object, None
+        return stored, fingerprint
+
     # Function to convert a MyWaveAnalytics object to a DataFrame with resampling
     def serialize_mw_to_df(self, mw_object, sample_rate=50, eeg=True, ecg=False):
         try:
@@ -83,7 +124,7 @@ class EEGDataManager:
             st.error(f"Failed to convert EEG data to DataFrame: {e}")
             return None
 
-    def save_eeg_data_to_session(self, mw_object, filename, eeg_id):
+    def save_eeg_data_to_session(self, mw_object, filename, eeg_id, fingerprint=None):
         st.session_state.mw_object = mw_object
         try:
             st.session_state.recording_date = datetime.strptime(
@@ -94,17 +135,15 @@ class EEGDataManager:
             st.session_state.recording_date = "Jan 01, 2020"
         st.session_state.filename = filename
         st.session_state.eeg_id = eeg_id
-        mw_copy = mw_object.copy()
-        st.session_state.eeg_graph = {
-            "linked_ears": self.serialize_mw_to_df(mw_copy.eeg),
-            "centroid": self.serialize_mw_to_df(centroid(mw_copy.eeg)),
-            "bipolar_longitudinal": self.serialize_mw_to_df(
-                bipolar_longitudinal_montage(mw_copy.eeg)
-            ),
-        }
-        st.session_state.ecg_graph = self.serialize_mw_to_df(
-            mw_object.copy().eeg, ecg=True, eeg=False
-        )
+        fingerprint = fingerprint or recording_fingerprint(mw_object.eeg)
+        # Pages reload the recording on every rerun: montages already built for
+        # it are kept, along with their prefetch.
+        if fingerprint != st.session_state.get("recording_fingerprint") or not isinstance(
+            st.session_state.get("eeg_graph"), MontageGraph
+        ):
+            # Montages are built on first view, the loaded object is left unchanged.
+            st.session_state.eeg_graph = MontageGraph(mw_object.eeg)
+        st.session_state.recording_fingerprint = fingerprint
 
     async def handle_uploaded_file(self, uploaded_file):
         saved_path = self.save_uploaded_file(uploaded_file)
@@ -121,17 +160,63 @@ class EEGDataManager:
             if eeg_type is None:
                 st.error("Unsupported file type.")
             else:
-                mw_object = self.load_mw_object(saved_path, eeg_type)
+                mw_object, fingerprint = self.load_recording(saved_path, eeg_type)
                 if mw_object:
                     st.success("EEG Data loaded successfully!")
-                    self.save_eeg_data_to_session(mw_object, uploaded_file.name, None)
+                    self.save_eeg_data_to_session(
+                        mw_object, uploaded_file.name, None, fingerprint
+                    )
 
 
 
+    def download_progress(self):
+        """
+        Progress callback for MyWavePlatformApi.download_eeg_file, showing the
+        downloaded size and throughput in a progress bar.
+        """
+        bar = st.progress(0.0, text="Downloading EEG...")
+        start = time.perf_counter()
+        shown = {"percent": -1}
+
+        def update(done, total):
+            # Redraw once per percent, not once per chunk
+            percent = int(100 * done / total) if total else 0
+            if percent == shown["percent"] and done != total:
+                return
+            shown["percent"] = percent
+            rate = done / 1e6 / max(time.perf_counter() - start, 1e-9)
+            size = f"{done / 1e6:.0f} MB"
+            if total:
+                size = f"{done / 1e6:.0f} / {total / 1e6:.0f} MB"
+            bar.progress(
+                min(percent, 100) / 100, text=f"Downloading EEG... {size} ({rate:.1f} MB/s)"
+            )
+
+        return bar, update
+
     async def handle_downloaded_file(self, eeg_id):
-        downloaded_path, file_extension = await self.api_service.download_eeg_file(
-            eeg_id, self.headers
-        )
+        # Studies already downloaded by any session are read from the disk cache
+        file_cache = get_eeg_file_cache()
+        downloaded_path, file_extension = file_cache.get(eeg_id)
+        uncached = False
+        if downloaded_path is None:
+            bar, progress_callback = self.download_progress()
+            downloaded_path, file_extension = await self.api_service.download_eeg_file(
+                eeg_id,
+                self.headers,
+                progress_callback=progress_callback,
+                directory=file_cache.temporary_directory(),
+            )
+            bar.empty()
+            if downloaded_path:
+                try:
+                    downloaded_path = file_cache.put(
+                        eeg_id, downloaded_path, file_extension
+                    )
+                except OSError as e:
+                    st.error(f"Failed to cache the EEG file: {e}")
+                    uncached = True
+
         if downloaded_path:
             eeg_type = (
                 0
@@ -141,14 +226,23 @@ class EEGDataManager:
                 else None
             )
             if eeg_type is not None:
-                mw_object = self.load_mw_object(downloaded_path, eeg_type)
+                # Cached files are named by their SHA-256, see EEGFileCache
+                content_hash = None if uncached else Path(downloaded_path).stem
+                mw_object, fingerprint = self.load_recording(
+                    downloaded_path, eeg_type, content_hash
+                )
                 if mw_object:
-                    self.save_eeg_data_to_session(mw_object, downloaded_path, eeg_id)
+                    self.save_eeg_data_to_session(
+                        mw_object, downloaded_path, eeg_id, fingerprint
+                    )
 
-            try:
-                os.remove(downloaded_path)
-            except Exception as e:
-                st.error(f"Failed to delete the temporary file: {e}")
+            if uncached:
+                try:
+                    os.remove(downloaded_path)
+                except Exception as e:
+                    st.error(f"Failed to delete the temporary file: {e}")
+            else:
+                file_cache.release(downloaded_path)
 
     async def get_heart_rate_variables(self, eeg_id):
         heart_rate, stdev_bpm = await self.api_service.get_heart_rate_variables(eeg_id, self.headers)
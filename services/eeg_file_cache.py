@@ -0,0 +1,226 @@
+"""
+Disk cache of downloaded EEG files, shared by every Streamlit session of the server.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+EEG_FILE_CACHE_DIR = os.getenv(
+    "EEG_FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "wavelit-eeg-cache")
+)
+EEG_FILE_CACHE_BYTES = int(os.getenv("EEG_FILE_CACHE_BYTES", 10 * 1024**3))
+# Downloads and leased files left behind by a dead process are removed after this age
+EEG_FILE_CACHE_INCOMING_SECONDS = float(
+    os.getenv("EEG_FILE_CACHE_INCOMING_SECONDS", 24 * 3600)
+)
+
+
+def file_sha256(path, chunk_size=1024**2):
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EEGFileCache:
+    """Content-addressed cache of raw EEG files, bounded by bytes.
+
+    Files are stored once under their SHA-256 (blobs/<sha256><extension>) and
+    each eeg_id has a small JSON entry pointing to its blob. Every file is
+    written to a temporary name in the cache directory and moved in place with
+    os.replace, so concurrent sessions and processes never see a partial file.
+
+    Eviction is least recently used by blob modification time, which get
+    refreshes, so the cache state lives on disk and is shared between processes.
+
+    get and put hand out a hard link of the blob in the .incoming directory,
+    which eviction by another session cannot remove while the caller parses
+    it; the caller gives it back with release. Downloads are written to
+    .incoming too, and what a dead process left there is swept by evict
+    after max_incoming_age seconds.
+    """
+
+    def __init__(
+        self,
+        directory=EEG_FILE_CACHE_DIR,
+        max_bytes=EEG_FILE_CACHE_BYTES,
+        max_incoming_age=EEG_FILE_CACHE_INCOMING_SECONDS,
+    ):
+        """
+        :param directory: (str) cache directory, created if missing.
+        :param max_bytes: (int) budget of the cached EEG files.
+        :param max_incoming_age: (float) seconds after which downloads and
+            leased files are considered abandoned.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_incoming_age = max_incoming_age
+        self.blobs = self.directory / "blobs"
+        self.entries = self.directory / "entries"
+        self.incoming = self.directory / ".incoming"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.entries.mkdir(parents=True, exist_ok=True)
+        self.incoming.mkdir(parents=True, exist_ok=True)
+
+    def get(self, eeg_id):
+        """
+        Cached file of an EEG.
+
+        :param eeg_id: (str) EEG id.
+        :return: file path and extension, None and None when not cached. The
+            path is named <sha256><extension> and must be given back with release.
+        """
+        entry_path = self._entry_path(eeg_id)
+        try:
+            entry = json.loads(entry_path.read_text())
+            blob = self.blobs / f"{entry['sha256']}{entry['extension']}"
+            if blob.stat().st_size != entry["size"]:
+                raise ValueError("size mismatch")
+            os.utime(blob)
+            leased = self._lease(blob)
+        except FileNotFoundError:
+            return None, None
+        except (ValueError, KeyError, OSError) as e:
+            log.warning("Dropping EEG file cache entry of %s: %s", eeg_id, e)
+            entry_path.unlink(missing_ok=True)
+            return None, None
+        return leased, entry["extension"]
+
+    def put(self, eeg_id, path, extension):
+        """
+        Move a downloaded file into the cache, then evict down to the budget.
+
+        The file is moved when it is on the same file system as the cache
+        (see temporary_directory), copied otherwise.
+
+        :param eeg_id: (str) EEG id.
+        :param path: (str) downloaded file, no longer owned by the caller.
+        :param extension: (str) file extension, e.g. ".edf".
+        :return: path of the cached file, to give back with release, see get.
+        """
+        sha256 = file_sha256(path)
+        size = os.path.getsize(path)
+        blob = self.blobs / f"{sha256}{extension}"
+
+        if blob.exists():
+            os.remove(path)
+            os.utime(blob)
+        else:
+            try:
+                os.replace(path, blob)
+            except OSError:
+                # Another file system, copy next to the blob then rename
+                with open(path, "rb") as source:
+                    self._write_atomic(blob, source)
+                os.remove(path)
+
+        entry = {"sha256": sha256, "extension": extension, "size": size}
+        self._write_atomic(self._entry_path(eeg_id), json.dumps(entry).encode())
+
+        leased = self._lease(blob)
+        self.evict()
+        return leased
+
+    def release(self, path):
+        """Give back a path returned by get or put."""
+        path = Path(path)
+        if path.parent.parent == self.incoming:
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+    def temporary_directory(self):
+        """Directory to download into, so put only renames the file."""
+        return str(self.incoming)
+
+    def nbytes(self):
+        return sum(blob.stat().st_size for blob in self._blobs())
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits its budget."""
+        self._sweep_incoming()
+
+        blobs = []
+        for blob in self._blobs():
+            try:
+                stat = blob.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, blob))
+
+        total = sum(size for _, size, _ in blobs)
+        for _, size, blob in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            # Entries pointing to a removed blob are dropped on their next get
+            blob.unlink(missing_ok=True)
+            total -= size
+            log.info("Evicted %s from the EEG file cache", blob.name)
+
+    def _lease(self, blob):
+        """Hard link of blob under its own name in a new .incoming directory."""
+        lease_dir = Path(tempfile.mkdtemp(dir=self.incoming))
+        leased = lease_dir / blob.name
+        try:
+            os.link(blob, leased)
+        except FileNotFoundError:
+            lease_dir.rmdir()
+            raise
+        except OSError:
+            # No hard links on this file system, the caller reads the blob itself
+            lease_dir.rmdir()
+            return str(blob)
+        return str(leased)
+
+    def _sweep_incoming(self):
+        """Remove downloads and leases older than max_incoming_age."""
+        cutoff = time.time() - self.max_incoming_age
+        for path in self.incoming.iterdir():
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+            log.info("Removed abandoned %s from the EEG file cache", path.name)
+
+    def _blobs(self):
+        return [blob for blob in self.blobs.iterdir() if not blob.name.startswith(".")]
+
+    def _entry_path(self, eeg_id):
+        name = hashlib.blake2b(str(eeg_id).encode(), digest_size=16).hexdigest()
+        return self.entries / f"{name}.json"
+
+    def _write_atomic(self, path, data):
+        """Write bytes or a binary file object to a temporary name, then rename it to path."""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                if isinstance(data, bytes):
+                    tmp_file.write(data)
+                else:
+                    for chunk in iter(lambda: data.read(1024**2), b""):
+                        tmp_file.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+@st.cache_resource
+def get_eeg_file_cache():
+    """EEG file cache shared by every session, bounded by EEG_FILE_CACHE_BYTES."""
+    return EEGFileCache()
@@ -0,0 +1,190 @@
+"""
+HTTP connection pool shared by every Streamlit session of the server.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import aiohttp
+
+from services import runtime
+
+log = logging.getLogger(__name__)
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", 60))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300))
+
+
+class Response:
+    """Status, headers and body of a finished request."""
+
+    def __init__(self, status, headers, body, reason=None, request_info=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.reason = reason
+        self.request_info = request_info
+
+    def raise_for_status(self):
+        """Raise aiohttp.ClientResponseError on 4xx and 5xx, like aiohttp."""
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self.request_info,
+                (),
+                status=self.status,
+                message=self.reason or "",
+                headers=self.headers,
+            )
+
+    def json(self):
+        # None for an empty body, like aiohttp
+        return json.loads(self.body) if self.body.strip() else None
+
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+class HttpClient:
+    """One aiohttp session with a tuned connector, for the whole process.
+
+    Streamlit scripts run coroutines on their own event loop, while an aiohttp
+    session is bound to one loop. The session therefore lives on the background
+    loop of services.runtime, in its session registry, and request and download
+    are awaitables of any loop that run there. Connections are kept alive
+    across reruns and sessions, and DNS lookups are cached.
+
+    Connection reuse is counted with a TraceConfig, see stats.
+    """
+
+    def __init__(
+        self,
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+    ):
+        self.connector_options = dict(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache,
+        )
+        self.counters = {"requests": 0, "connections_created": 0, "connections_reused": 0}
+        self._session_name = f"http-{id(self)}"
+
+    async def request(self, method, url, raise_for_status=True, **kwargs):
+        """
+        Send a request through the shared session and read the whole body.
+
+        :param method: (str) HTTP method.
+        :param url: (str) request URL.
+        :param raise_for_status: (bool) raise aiohttp.ClientResponseError on 4xx and 5xx.
+        :param kwargs: passed to aiohttp.ClientSession.request.
+        :return: Response
+        """
+        return await runtime.submit(
+            self._request(method, url, raise_for_status, **kwargs)
+        )
+
+    async def download(self, url, file, chunk_size, progress_callback=None, **kwargs):
+        """
+        Stream a GET response into a binary file, chunk_size bytes at a time.
+
+        :param url: (str) file URL.
+        :param file: binary file object written in order.
+        :param chunk_size: (int) bytes read and written at a time.
+        :param progress_callback: (callable) called with the bytes written so far
+            and the content length, None when unknown, on the loop of the caller.
+        :param kwargs: passed to aiohttp.ClientSession.get.
+        :return: the number of bytes written.
+        """
+        caller_loop = asyncio.get_running_loop()
+
+        def progress(done, total):
+            # Called from the runtime loop, Streamlit calls need the script thread
+            caller_loop.call_soon_threadsafe(progress_callback, done, total)
+
+        return await runtime.submit(
+            self._download(
+                url, file, chunk_size, progress if progress_callback else None, **kwargs
+            )
+        )
+
+    def stats(self):
+        """Requests sent and connections created or reused since the client started."""
+        return dict(self.counters)
+
+    def _get_session(self):
+        # Only called on the runtime loop
+        return runtime.get_session(
+            self._session_name,
+            lambda: aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(**self.connector_options),
+                trace_configs=[self._trace_config()],
+            ),
+        )
+
+    async def _request(self, method, url, raise_for_status, **kwargs):
+        async with self._get_session().request(method, url, **kwargs) as response:
+            if raise_for_status:
+                response.raise_for_status()
+            body = await response.read()
+            return Response(
+                response.status,
+                dict(response.headers),
+                body,
+                reason=response.reason,
+                request_info=response.request_info,
+            )
+
+    async def _download(self, url, file, chunk_size, progress_callback, **kwargs):
+        loop = asyncio.get_running_loop()
+        async with self._get_session().get(url, **kwargs) as response:
+            response.raise_for_status()
+            total = response.content_length
+            done = 0
+            async for chunk in response.content.iter_chunked(chunk_size):
+                # Disk writes go to a worker thread, the loop serves every session
+                await loop.run_in_executor(None, file.write, chunk)
+                done += len(chunk)
+                if progress_callback is not None:
+                    progress_callback(done, total)
+            return done
+
+    def _trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.counters["requests"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.counters["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.counters["connections_reused"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """HTTP client of the process, created on first use.
+
+    Its session is closed with the runtime loop at exit, see services.runtime.shutdown.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
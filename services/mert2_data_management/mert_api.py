@@ -1,3 +1,4 @@
+import hashlib
 import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
@@ -10,6 +11,9 @@ from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from zoneinfo import ZoneInfo
 
+from services.http_client import Response, get_http_client
+from services.token_cache import get_token_cache, token_expiry
+
 
 
 class Credentials(BaseSettings):
@@ -79,22 +83,39 @@ class MeRTApi:
         self.clinic_id = clinic_id
 
     async def _login(self) -> str:
+        """Set the access token, shared by every session with the same credentials."""
+        if not self.config.cybermed.url:
+            raise ValueError("The base URL (self.config.cybermed.url) is not set.")
+
+        self.token = await get_token_cache().get(self._token_key(), self._fetch_token)
+        return self.token
+
+    async def _reauthenticate(self) -> str:
+        """Replace a token the server rejected."""
+        get_token_cache().invalidate(self._token_key(), self.token)
+        return await self._login()
+
+    def _token_key(self) -> tuple:
+        scientist = self.config.cybermed.scientist
+        return (
+            self.config.cybermed.url,
+            f"{self.config.cybermed.project_prefix}{scientist.username}",
+            hashlib.sha256(scientist.password.encode()).hexdigest(),
+        )
+
+    async def _fetch_token(self) -> tuple:
         url = urljoin(self.config.cybermed.url, "auth/api/v1/get-access-token/")
         auth = aiohttp.BasicAuth(
             f"{self.config.cybermed.project_prefix}{self.config.cybermed.scientist.username}",
             self.config.cybermed.scientist.password,
         )
 
-        if not self.config.cybermed.url:
-            raise ValueError("The base URL (self.config.cybermed.url) is not set.")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url, auth=auth, timeout=self.config.timeout
-            ) as response:
-                response.raise_for_status()
-                result = await response.json()
-                self.token = result["token"]
+        response = await get_http_client().request(
+            "GET", url, auth=auth, timeout=self.config.timeout
+        )
+        result = response.json()
+        token = result["token"]
+        return token, token_expiry(token, result.get("expires_in"))
 
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -106,19 +127,23 @@ class MeRTApi:
         self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         url = urljoin(self.config.macro.url, f"{endpoint}")
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
+        # A 401 is retried once with a new token
+        for retry in (True, False):
+            response = await get_http_client().request(
                 method,
                 url,
+                raise_for_status=False,
                 headers=self._get_headers(),
                 json=data,
                 timeout=self.config.timeout,
-            ) as response:
+            )
+            if not (retry and response.status == 401):
                 response.raise_for_status()
                 if "text/html" in response.headers.get("Content-Type", ""):
                     return await self._parse_html_response(response)
                 else:
-                    return await response.json()
+                    return response.json()
+            await self._reauthenticate()
 
     async def _make_neuralink_request(
         self, method: str, endpoint: str, n_phases: Optional[int]
@@ -131,21 +156,25 @@ class MeRTApi:
         else:
             url = urljoin(self.config.neuralink.url, f"{endpoint}?usergroup={self.clinic_id}&eeg_id={eeg_id}&patient_id={patient_id}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.request(
+        # A 401 is retried once with a new token
+        for retry in (True, False):
+            response = await get_http_client().request(
                 method,
                 url,
+                raise_for_status=False,
                 headers=self._get_headers(),
                 timeout=self.config.timeout,
-            ) as response:
+            )
+            if not (retry and response.status == 401):
                 response.raise_for_status()
                 if "text/html" in response.headers.get("Content-Type", ""):
                     return await self._parse_html_response(response)
                 else:
-                    return await response.json()
+                    return response.json()
+            await self._reauthenticate()
 
-    async def _parse_html_response(self, response: aiohttp.ClientResponse) -> str:
-        raw_content = await response.read()
+    async def _parse_html_response(self, response: Response) -> str:
+        raw_content = response.body
         return raw_content
 
     async def get_user(self) -> str:
@@ -154,12 +183,10 @@ class MeRTApi:
             f"{self.config.cybermed.project_prefix}{self.config.cybermed.scientist.username}",
             self.config.cybermed.scientist.password,
         )
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url, auth=auth, timeout=self.config.timeout
-            ) as response:
-                response.raise_for_status()
-                return await response.json()
+        response = await get_http_client().request(
+            "GET", url, auth=auth, timeout=self.config.timeout
+        )
+        return response.json()
 
     async def mert_login(self, login: bool, username: str) -> Dict[str, Any]:
         return await self._make_request(
@@ -446,31 +473,37 @@ class MeRTApi:
             + "macro-service/api/v1/report_management/save_document"
         )
 
-        # Create a multipart form data
-        form_data = aiohttp.FormData(quote_fields=False)
-        form_data.add_field("userGroupId", self.clinic_id)
-        form_data.add_field("patientId", self.patient_id)
-        form_data.add_field("eegId", self.eeg_id)
+        def make_form_data():
+            # Create a multipart form data, it is consumed by each request
+            form_data = aiohttp.FormData(quote_fields=False)
+            form_data.add_field("userGroupId", self.clinic_id)
+            form_data.add_field("patientId", self.patient_id)
+            form_data.add_field("eegId", self.eeg_id)
 
-        form_data.add_field(
-            "file", file.getvalue(), filename=file.name, content_type=file.type
-        )
+            form_data.add_field(
+                "file", file.getvalue(), filename=file.name, content_type=file.type
+            )
+            return form_data
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
+        # A 401 is retried once with a new token
+        for retry in (True, False):
+            response = await get_http_client().request(
+                "POST",
                 url,
-                data=form_data,
+                raise_for_status=False,
+                data=make_form_data(),
                 headers={
                     "Authorization": f"Bearer {self.token}",
                 },
-            ) as response:
-                if response.status in (200, 204):
-                    return await response.text()  # This should be the document_id
-                else:
-                    error_text = await response.text()
-                    raise Exception(
-                        f"Failed to save document. Status: {response.status}, Error: {error_text}"
-                    )
+            )
+            if response.status in (200, 204):
+                return response.text()  # This should be the document_id
+            elif not (retry and response.status == 401):
+                error_text = response.text()
+                raise Exception(
+                    f"Failed to save document. Status: {response.status}, Error: {error_text}"
+                )
+            await self._reauthenticate()
 
     async def delete_document(self, document_id: str) -> Dict[str, Any]:
         return await self._make_request(
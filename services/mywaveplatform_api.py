@@ -1,13 +1,21 @@
 import asyncio
 import base64
+import logging
 import os
 import tempfile
+import time
 from pathlib import Path
 from urllib.parse import urlparse
 
 import aiohttp
 import streamlit as st
 
+from services.http_client import get_http_client
+
+log = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", 1024**2))
+
 
 class MyWavePlatformApi:
     """
@@ -32,71 +40,112 @@ class MyWavePlatformApi:
 
     async def login(self):
         auth_header = self.get_basic_auth_header()
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/user/login",
-                headers={**auth_header, "Content-Type": "application/json"},
-            ) as response:
-                if response.status == 200:
-                    response_data = await response.json()
-                    bearer_token = response_data["message"]["IdToken"]
-                    return {
-                        "Authorization": f"Bearer {bearer_token}",
-                        "x-api-key": self.api_key,
-                    }
-                else:
-                    raise Exception("Login failed: " + await response.text())
-
-    async def download_eeg_file(self, eeg_id, headers):
+        response = await get_http_client().request(
+            "POST",
+            f"{self.base_url}/user/login",
+            raise_for_status=False,
+            headers={**auth_header, "Content-Type": "application/json"},
+        )
+        if response.status == 200:
+            response_data = response.json()
+            bearer_token = response_data["message"]["IdToken"]
+            return {
+                "Authorization": f"Bearer {bearer_token}",
+                "x-api-key": self.api_key,
+            }
+        else:
+            raise Exception("Login failed: " + response.text())
+
+    async def download_eeg_file(
+        self,
+        eeg_id,
+        headers,
+        progress_callback=None,
+        chunk_size=DOWNLOAD_CHUNK_BYTES,
+        directory=None,
+    ):
+        """
+        Download an EEG file to a temporary file, streamed in fixed-size chunks.
+
+        At most chunk_size bytes of the file are held in memory. The download
+        size, time and throughput are logged once it completes.
+
+        :param eeg_id: (str) EEG id.
+        :param headers: (dict) authorization headers, see login.
+        :param progress_callback: (callable) called with the bytes written so far
+            and the file size, None when the server does not send it.
+        :param chunk_size: (int) bytes read and written at a time.
+        :param directory: (str) directory of the temporary file, defaults to the
+            system temporary directory.
+        :return: temporary file path and file extension, None and None on failure.
+        """
+        client = get_http_client()
+        tmp_path = None
+        downloaded = False
         try:
             request_data = {"eeg_id": eeg_id}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/eeg", headers=headers, json=request_data
-                ) as response:
-                    response.raise_for_status()
-
-                    download_url = (await response.json()).get("download_url")
-                    if download_url:
-                        async with session.get(download_url) as file_response:
-                            file_response.raise_for_status()
-
-                            parsed_url = urlparse(download_url)
-                            file_name = os.path.basename(parsed_url.path)
-                            file_extension = Path(file_name).suffix
-
-                            with tempfile.NamedTemporaryFile(
-                                delete=False, suffix=file_extension
-                            ) as tmp_file:
-                                tmp_file.write(await file_response.read())
-                                return tmp_file.name, file_extension
-                    else:
-                        st.error("Download URL not found in the response.")
-                        return None, None
+            response = await client.request(
+                "GET", f"{self.base_url}/eeg", headers=headers, json=request_data
+            )
+
+            download_url = response.json().get("download_url")
+            if download_url:
+                parsed_url = urlparse(download_url)
+                file_name = os.path.basename(parsed_url.path)
+                file_extension = Path(file_name).suffix
+
+                start = time.perf_counter()
+                with tempfile.NamedTemporaryFile(
+                    delete=False, suffix=file_extension, dir=directory
+                ) as tmp_file:
+                    tmp_path = tmp_file.name
+                    done = await client.download(
+                        download_url, tmp_file, chunk_size, progress_callback
+                    )
+
+                elapsed = time.perf_counter() - start
+                log.info(
+                    "Downloaded EEG %s: %.1f MB in %.2f s (%.1f MB/s)",
+                    eeg_id,
+                    done / 1e6,
+                    elapsed,
+                    done / 1e6 / max(elapsed, 1e-9),
+                )
+                downloaded = True
+                return tmp_path, file_extension
+            else:
+                st.error("Download URL not found in the response.")
+                return None, None
         except aiohttp.ClientError as e:
             st.error(f"Error downloading EEG file: {e}")
             return None, None
+        finally:
+            # Do not leave a partial file behind, whatever interrupted the download
+            if not downloaded and tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
 
     async def get_heart_rate_variables(self, eeg_id, headers):
         try:
             request_data = {"eeg_id": eeg_id}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/eeg/hr_variables",
-                    headers=headers,
-                    json=request_data,
-                ) as response:
-                    response.raise_for_status()
-
-                    ecg_statistics = (await response.json()).get("ecg_statistics", {})
-
-                    if ecg_statistics:
-                        heart_rate = ecg_statistics.get("heartrate_bpm")
-                        stdev_bpm = ecg_statistics.get("stdev_bpm")
-                    else:
-                        heart_rate, stdev_bpm = 0, 0
-
-                    return heart_rate, stdev_bpm
+            response = await get_http_client().request(
+                "GET",
+                f"{self.base_url}/eeg/hr_variables",
+                headers=headers,
+                json=request_data,
+            )
+
+            ecg_statistics = response.json().get("ecg_statistics", {})
+
+            if ecg_statistics:
+                heart_rate = ecg_statistics.get("heartrate_bpm")
+                stdev_bpm = ecg_statistics.get("stdev_bpm")
+            else:
+                heart_rate, stdev_bpm = 0, 0
+
+            return heart_rate, stdev_bpm
         except aiohttp.ClientError as e:
             st.error(f"Error retrieving heart rate variables: {e}")
             return None, None
@@ -104,16 +153,13 @@ class MyWavePlatformApi:
     async def get_aea_onsets(self, eeg_id, headers):
         try:
             request_data = {"eeg_id": eeg_id}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/abnormality/aea",
-                    headers=headers,
-                    json=request_data,
-                ) as response:
-                    response.raise_for_status()
-
-                    aea = await response.json()
-                    return aea
+            response = await get_http_client().request(
+                "GET",
+                f"{self.base_url}/abnormality/aea",
+                headers=headers,
+                json=request_data,
+            )
+            return response.json()
         except aiohttp.ClientError as e:
             st.error(f"Error retrieving AEA onsets: {e}")
             return None
@@ -121,16 +167,13 @@ class MyWavePlatformApi:
     async def get_ahr_onsets(self, eeg_id, headers):
         try:
             request_data = {"eeg_id": eeg_id}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/abnormality/ahr",
-                    headers=headers,
-                    json=request_data,
-                ) as response:
-                    response.raise_for_status()
-
-                    ahr = await response.json()
-                    return ahr
+            response = await get_http_client().request(
+                "GET",
+                f"{self.base_url}/abnormality/ahr",
+                headers=headers,
+                json=request_data,
+            )
+            return response.json()
         except aiohttp.ClientError as e:
             st.error(f"Error retrieving AHR onsets: {e}")
             return None
@@ -138,16 +181,13 @@ class MyWavePlatformApi:
     async def get_autoreject_annots(self, eeg_id, headers):
         try:
             request_data = {"eeg_id": eeg_id}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/abnormality/autoreject",
-                    headers=headers,
-                    json=request_data,
-                ) as response:
-                    response.raise_for_status()
-
-                    autoreject = await response.json()
-                    return autoreject
+            response = await get_http_client().request(
+                "GET",
+                f"{self.base_url}/abnormality/autoreject",
+                headers=headers,
+                json=request_data,
+            )
+            return response.json()
         except aiohttp.ClientError as e:
             st.error(f"Error retrieving autoreject annotations: {e}")
             return None
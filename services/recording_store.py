@@ -0,0 +1,249 @@
+"""
+Disk store of preprocessed recordings, shared by every Streamlit session of the server.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+import mne
+import numpy as np
+import streamlit as st
+
+from utils.helpers import recording_fingerprint
+
+log = logging.getLogger(__name__)
+
+RECORDING_STORE_DIR = os.getenv(
+    "RECORDING_STORE_DIR",
+    os.path.join(tempfile.gettempdir(), "wavelit-recording-store"),
+)
+RECORDING_STORE_BYTES = int(os.getenv("RECORDING_STORE_BYTES", 20 * 1024**3))
+
+# Bump when the stored layout or the preprocessing changes
+STORE_VERSION = 1
+
+
+class StoredRaw(mne.io.BaseRaw):
+    """Raw that reads its samples from a stored float32 signal.npy, never preloaded.
+
+    The file is memory-mapped read-only and get_data converts only the requested
+    channels and times to float64, so every session shares the pages of one
+    recording instead of holding its own float64 copy. Copies, which pipelines
+    filter and resample in place, are regular float64 RawArrays.
+    """
+
+    def __init__(self, signal_path, info, first_samp=0):
+        """
+        :param signal_path: (str) signal.npy in volts, shaped (channels, times).
+        :param info: (mne.Info) info of the stored recording.
+        :param first_samp: (int) first sample of the stored recording.
+        """
+        signal = np.load(signal_path, mmap_mode="r")
+        info = info.copy()
+        with info._unlock():
+            # The stored signal is calibrated already
+            for ch in info["chs"]:
+                ch["cal"], ch["range"] = 1.0, 1.0
+        super().__init__(
+            info,
+            preload=False,
+            first_samps=(int(first_samp),),
+            last_samps=(int(first_samp) + signal.shape[1] - 1,),
+            filenames=(str(signal_path),),
+            # Readers only see _raw_extras and _filenames, see BaseRaw._read_segment
+            raw_extras=({"signal": signal, "first_samp": int(first_samp)},),
+            orig_format="single",
+            verbose=False,
+        )
+
+    def _read_segment_file(self, data, idx, fi, start, stop, cals, mult):
+        extras = self._raw_extras[fi]
+        first = extras["first_samp"]
+        block = extras["signal"][:, start - first : stop - first]
+        if mult is not None:
+            data[:] = mult @ block[idx]
+        else:
+            data[:] = block[idx]
+            data *= cals
+
+    def __deepcopy__(self, memo):
+        raw = mne.io.RawArray(
+            self.get_data(),
+            copy.deepcopy(self.info, memo),
+            first_samp=self.first_samp,
+            verbose=False,
+        )
+        raw.set_annotations(self.annotations)
+        return raw
+
+
+class RecordingStore:
+    """Preprocessed recordings stored as memory-mapped float32 signal matrices.
+
+    Each recording is a directory holding:
+    - signal.npy: the filtered signal in volts, float32, shaped (channels, times),
+    - shell.pkl: the MyWaveAnalytics object without its signal, its MNE info and
+      annotations,
+    - meta.json: channel names, sfreq, meas_date, ECG channels and the recording
+      fingerprint (utils.helpers.recording_fingerprint), written last.
+
+    Opening a stored recording maps signal.npy read-only behind a StoredRaw, so
+    its pages are shared by every session and process through the OS page
+    cache, and skips parsing and filtering. Recordings are written to a temporary directory
+    renamed in place, and evicted least recently used past max_bytes.
+    """
+
+    def __init__(self, directory=RECORDING_STORE_DIR, max_bytes=RECORDING_STORE_BYTES):
+        """
+        :param directory: (str) store directory, created if missing.
+        :param max_bytes: (int) budget of the stored signals.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash, *settings):
+        """
+        Store key of a recording file and the settings it was preprocessed with.
+
+        :param content_hash: (str) hash of the raw EEG file, e.g. its SHA-256.
+        :param settings: hashable loading and filter settings, e.g. the EEG type
+            and filter cutoffs.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((STORE_VERSION, content_hash, settings)).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Stored recording.
+
+        :param key: (str) see key.
+        :return: the MyWaveAnalytics object, its eeg a StoredRaw, and the
+            recording fingerprint. None and None when not stored.
+        """
+        path = self.directory / key
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            with open(path / "shell.pkl", "rb") as file:
+                mw_object, info, annotations, first_samp = pickle.load(file)
+            raw = StoredRaw(path / "signal.npy", info, first_samp=first_samp)
+            os.utime(path / "meta.json")
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            log.warning("Dropping stored recording %s: %s", key, e)
+            shutil.rmtree(path, ignore_errors=True)
+            return None, None
+
+        raw.set_annotations(annotations)
+        mw_object.eeg = raw
+        return mw_object, meta["fingerprint"]
+
+    def put(self, key, mw_object):
+        """
+        Store a preprocessed recording and open it back from the store.
+
+        The returned object holds the float32 rounded signal, so every session
+        sees the same signal and fingerprint whether it stored the recording
+        or not.
+
+        :param key: (str) see key.
+        :param mw_object: (MyWaveAnalytics) loaded and filtered recording.
+        :return: the stored object and its fingerprint, see get.
+        """
+        raw = mw_object.eeg
+        shell = copy.copy(mw_object)
+        shell.eeg = None
+
+        path = self.directory / key
+        tmp_path = Path(tempfile.mkdtemp(dir=self.directory, prefix=f".{key}-"))
+        try:
+            signal = np.lib.format.open_memmap(
+                tmp_path / "signal.npy",
+                mode="w+",
+                dtype=np.float32,
+                shape=(len(raw.ch_names), raw.n_times),
+            )
+            signal[:] = raw.get_data()
+            signal.flush()
+            del signal
+
+            with open(tmp_path / "shell.pkl", "wb") as file:
+                pickle.dump(
+                    (shell, raw.info, raw.annotations, raw.first_samp),
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+            # The fingerprint is of the stored signal, which get serves
+            fingerprint = recording_fingerprint(
+                StoredRaw(tmp_path / "signal.npy", raw.info, first_samp=raw.first_samp)
+            )
+            meta = {
+                "ch_names": raw.ch_names,
+                "sfreq": raw.info["sfreq"],
+                "meas_date": str(raw.info["meas_date"]),
+                "ecg_channels": [
+                    raw.ch_names[i] for i in mne.pick_types(raw.info, eeg=False, ecg=True)
+                ],
+                "fingerprint": fingerprint,
+            }
+            (tmp_path / "meta.json").write_text(json.dumps(meta))
+
+            # Another session may have stored it meanwhile, keep the first one
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self.evict(keep=key)
+        return self.get(key)
+
+    def nbytes(self):
+        return sum(size for _, size, _ in self._recordings())
+
+    def evict(self, keep=None):
+        """Remove the least recently used recordings until the store fits its budget."""
+        recordings = self._recordings()
+        total = sum(size for _, size, _ in recordings)
+        for _, size, path in sorted(recordings):
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            # Open memory maps of other sessions stay valid after the unlink
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            log.info("Evicted recording %s from the store", path.name)
+
+    def _recordings(self):
+        """(last use, bytes, path) of every complete stored recording."""
+        recordings = []
+        for path in self.directory.iterdir():
+            if path.name.startswith("."):
+                continue
+            try:
+                last_use = (path / "meta.json").stat().st_mtime
+                size = sum(file.stat().st_size for file in path.iterdir())
+            except FileNotFoundError:
+                continue
+            recordings.append((last_use, size, path))
+        return recordings
+
+
+@st.cache_resource
+def get_recording_store():
+    """Recording store shared by every session, bounded by RECORDING_STORE_BYTES."""
+    return RecordingStore()
@@ -0,0 +1,143 @@
+"""
+Async runtime of the server: one background event loop per process, and the
+bridge Streamlit scripts use to run coroutines.
+
+Network I/O runs on the background loop (submit), whose aiohttp sessions
+(get_session) are shared by every session and rerun, so connections are pooled.
+Streamlit scripts run coroutines with run_sync, on an event loop kept for the
+whole script thread: coroutines keep their Streamlit context (st.session_state,
+elements) and every call of a render reuses one loop.
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+import weakref
+
+log = logging.getLogger(__name__)
+
+_loop = None
+_thread = None
+_sessions = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_loop():
+    """Background event loop of the process, started on first use."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_loop.run_forever, name="runtime-loop", daemon=True
+            )
+            _thread.start()
+        return _loop
+
+
+async def submit(coro):
+    """
+    Run a coroutine on the background loop and await it from any event loop.
+
+    :param coro: coroutine, it may use get_session.
+    :return: the result of coro.
+    """
+    loop = get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def spawn(coro):
+    """
+    Run a coroutine on the background loop without waiting for it.
+
+    :return: (concurrent.futures.Future) future of the result of coro.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def get_session(name, factory):
+    """
+    Shared session registered under name, created by factory on first use.
+
+    Only call it from the background loop, e.g. in a coroutine given to submit,
+    since aiohttp sessions are bound to the loop they were created on.
+
+    :param name: (str) registry key, e.g. "http".
+    :param factory: callable returning a new session, e.g. an aiohttp.ClientSession.
+    :return: the session registered under name.
+    """
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        session = _sessions[name] = factory()
+    return session
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from Streamlit script code, in place of asyncio.run.
+
+    The coroutine runs on an event loop kept for the calling thread, so it keeps
+    the Streamlit context of the script. The loop is closed when the thread ends.
+
+    :param coro: coroutine.
+    :return: the result of coro.
+    """
+    return _thread_loop().run_until_complete(coro)
+
+
+def run_sync_all(*coros):
+    """
+    Run independent coroutines concurrently from Streamlit script code, see run_sync.
+
+    If one of them raises, the others are cancelled.
+
+    :return: (list) the results, in the order of coros.
+    """
+    return run_sync(_gather(coros))
+
+
+async def _gather(coros):
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        # Nothing is left pending on the thread loop
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _thread_loop():
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+        weakref.finalize(threading.current_thread(), loop.close)
+    return loop
+
+
+def shutdown():
+    """Close the registered sessions and stop the background loop."""
+    global _loop, _thread
+    with _lock:
+        loop, thread, _loop, _thread = _loop, _thread, None, None
+    if loop is None:
+        return
+
+    async def close_sessions():
+        for session in _sessions.values():
+            await session.close()
+        _sessions.clear()
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_sessions(), loop).result(timeout=10)
+    except Exception:
+        log.exception("Closing the runtime sessions failed")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+
+
+atexit.register(shutdown)
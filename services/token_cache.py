@@ -0,0 +1,140 @@
+"""
+Access tokens shared by every Streamlit session of the server.
+"""
+
+import asyncio
+import base64
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+
+from services import runtime
+
+log = logging.getLogger(__name__)
+
+# Tokens are refreshed in the background during their last TOKEN_REFRESH_SECONDS
+TOKEN_REFRESH_SECONDS = float(os.getenv("TOKEN_REFRESH_SECONDS", 300))
+# Lifetime of tokens whose expiry is unknown
+TOKEN_DEFAULT_TTL_SECONDS = float(os.getenv("TOKEN_DEFAULT_TTL_SECONDS", 3000))
+
+
+def token_expiry(token, expires_in=None, default_ttl=TOKEN_DEFAULT_TTL_SECONDS):
+    """
+    Expiry time of an access token.
+
+    :param token: (str) access token, the exp claim is used when it is a JWT.
+    :param expires_in: (float) lifetime in seconds sent with the token, if any.
+    :param default_ttl: (float) lifetime in seconds when the expiry is unknown.
+    :return: (float) expiry as a time.time() timestamp.
+    """
+    if expires_in is not None:
+        return time.time() + float(expires_in)
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+class TokenCache:
+    """Process-wide access tokens keyed by credentials.
+
+    - A cached token is returned until it expires, without a login round trip.
+    - In the last refresh_margin seconds of its lifetime, the token is still
+      returned and a new one is fetched on the runtime background loop.
+    - Logins are single-flight: concurrent callers with the same key, from any
+      session thread or event loop, wait for one login instead of each sending
+      their own.
+    - invalidate drops a token the server rejected, e.g. on a 401.
+    """
+
+    def __init__(self, refresh_margin=TOKEN_REFRESH_SECONDS):
+        """
+        :param refresh_margin: (float) seconds before expiry when the token is refreshed.
+        """
+        self.refresh_margin = refresh_margin
+        self.counters = {"hits": 0, "logins": 0, "background_refreshes": 0}
+        self._tokens = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key, login):
+        """
+        Token of key, logging in when there is no valid one.
+
+        :param key: (tuple) hashable credentials, e.g. URL, username and a
+            password hash.
+        :param login: coroutine function returning the token and its expiry,
+            see token_expiry. It may run on the runtime background loop.
+        :return: (str) access token.
+        """
+        with self._lock:
+            token, expires_at = self._tokens.get(key, (None, 0.0))
+        now = time.time()
+        if now < expires_at:
+            self.counters["hits"] += 1
+            if now >= expires_at - self.refresh_margin:
+                self._refresh_in_background(key, login)
+            return token
+        return await self._login(key, login)
+
+    def invalidate(self, key, token):
+        """Drop the cached token of key if it is still token."""
+        with self._lock:
+            if self._tokens.get(key, (None,))[0] == token:
+                del self._tokens[key]
+
+    def stats(self):
+        """Cache hits, logins and background refreshes since the process started."""
+        return dict(self.counters)
+
+    async def _login(self, key, login):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                # A thread-safe future, awaitable from every event loop
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            self.counters["logins"] += 1
+            token, expires_at = await login()
+            with self._lock:
+                self._tokens[key] = (token, expires_at)
+            future.set_result(token)
+            return token
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _refresh_in_background(self, key, login):
+        with self._lock:
+            if key in self._inflight:
+                return
+        self.counters["background_refreshes"] += 1
+
+        async def refresh():
+            try:
+                await self._login(key, login)
+            except Exception:
+                # The current token stays in use until it expires
+                log.exception("Background token refresh failed")
+
+        runtime.spawn(refresh())
+
+
+_token_cache = TokenCache()
+
+
+def get_token_cache():
+    """Token cache of the process."""
+    return _token_cache
@@ -1,10 +1,10 @@
-import asyncio
 import os
 
 import streamlit as st
 import streamlit.components.v1 as components
 
 from access_control import access_eeg_data, get_version_from_pyproject
+from services.runtime import run_sync
 from streamlit_dashboards import (ecg_visualization_dashboard,
                                   eeg_epoch_visualization_dashboard,
                                   eeg_visualization_dashboard)
@@ -70,14 +70,14 @@ if not eeg_id:
 
     components.html(html, height=1200, scrolling=False)
 
-    asyncio.run(access_eeg_data(eeg_id))
+    run_sync(access_eeg_data(eeg_id))
 
     eeg_visualization_dashboard()
 
     ecg_visualization_dashboard()
 
 else:
-    asyncio.run(access_eeg_data(eeg_id))
+    run_sync(access_eeg_data(eeg_id))
 
     if show_eeg:
         eeg_visualization_dashboard()
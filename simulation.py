@@ -6,36 +6,18 @@ import mne
 import pandas as pd
 import streamlit as st
 from mywaveanalytics.libraries import mywaveanalytics as mwa
-from mywaveanalytics.libraries import filters, references
+from mywaveanalytics.libraries import filters
 
 from access_control import get_version_from_pyproject
 from data_models.abnormality_parsers import serialize_aea_to_pandas
+from dsp.montages import MontageGraph
 from streamlit_dashboards import eeg_visualization_dashboard
+from utils.helpers import recording_fingerprint
 
 
 st.set_page_config(layout="wide")
 
 
-def serialize_mw_to_df(mw_object, sample_rate=50, eeg=True, ecg=True):
-    try:
-        # Convert MyWaveObject MNE raw instance
-        filters.eeg_filter(mw_object, 1.5, None) # 1.9894
-        raw = mw_object
-
-        # Select channels based on EEG or ECG type
-        channels = raw.pick_types(eeg=eeg, ecg=ecg).ch_names
-        raw.pick_channels(channels)
-
-        # Downsample signal for better render speeds, lower sampling rates may impact graph spectral integrity.
-        raw = raw.resample(sample_rate)
-        df = raw.to_data_frame()
-        df["time"] = df.index / sample_rate
-        return df
-    except Exception as e:
-        st.error(f"Failed to convert EEG data to DataFrame: {e}")
-        return None
-
-
 def main():
     # Example of loading real EEG data from an EDF file
     edf_file_path = "synthetic_data/synthetic_eeg.edf"
@@ -62,13 +44,10 @@ def main():
         st.session_state.recording_date = datetime.now().strftime("%b %d, %Y")
         st.session_state.filename = "Synthetic Oscillations"
         st.session_state.eeg_id = "EEG-123456789"
-        st.session_state.eeg_graph = {
-            "linked_ears": serialize_mw_to_df(mw_object.eeg),
-            "centroid": serialize_mw_to_df(references.centroid(mw_object.copy().eeg)),
-            "bipolar_longitudinal": serialize_mw_to_df(
-                references.temporal_central_parasagittal(mw_object.copy().eeg)
-            ),
-        }
+        # Same viewer montages and ECG trace as a downloaded recording
+        filters.eeg_filter(mw_object.eeg, 1.5, None) # 1.9894
+        st.session_state.recording_fingerprint = recording_fingerprint(mw_object.eeg)
+        st.session_state.eeg_graph = MontageGraph(mw_object.eeg)
         st.session_state.aea = aea_data
         st.session_state.user = "Nicolas Cage"
 
@@ -2,10 +2,11 @@
 Sets up the component for noting abnormalities like AEA, AHR, MTHFR.
 """
 
-import asyncio
 
 import streamlit as st
 
+from services.runtime import run_sync
+
 
 @st.fragment
 def render_abnormalities(data_manager):
@@ -38,14 +39,14 @@ def render_abnormalities(data_manager):
                 with col2:
                     if not abnormality["isApproved"]:
                         if st.button("Approve", key=f"approve_{abnormality_id}"):
-                            asyncio.run(
+                            run_sync(
                                 data_manager.approve_abnormality(abnormality_id)
                             )
                             st.success(f"{name} has been approved.")
                             st.rerun()
                 with col3:
                     if st.button("Delete", key=f"delete_{abnormality_id}"):
-                        asyncio.run(data_manager.delete_abnormality(abnormality_id))
+                        run_sync(data_manager.delete_abnormality(abnormality_id))
                         st.success(f"{name} has been deleted.")
                         st.rerun()
         else:
@@ -70,6 +71,6 @@ def render_abnormalities(data_manager):
             if other_input:
                 converted_options.append(other_input)
 
-            asyncio.run(data_manager.save_abnormalities(converted_options))
+            run_sync(data_manager.save_abnormalities(converted_options))
             st.success("Irregularities added successfully!")
             st.rerun()
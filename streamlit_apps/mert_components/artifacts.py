@@ -2,10 +2,11 @@
 Note abnormalities common in EEG review.
 """
 
-import asyncio
 
 import streamlit as st
 
+from services.runtime import run_sync
+
 
 def get_artifact_map():
     return {
@@ -49,7 +50,7 @@ def render_artifact_distortions(data_manager):
                     st.write(f"- {full_label}")
                 with col2:
                     if st.button("Delete", key=f"delete_artifact_{artifact_id}"):
-                        asyncio.run(data_manager.delete_artifact(artifact_id))
+                        run_sync(data_manager.delete_artifact(artifact_id))
                         st.success(f"{full_label} has been deleted.")
                         st.rerun()
         else:
@@ -77,6 +78,6 @@ def render_artifact_distortions(data_manager):
             ]
             if other_input:
                 artifacts.append(other_input)
-            asyncio.run(data_manager.save_artifact_distortions(artifacts))
+            run_sync(data_manager.save_artifact_distortions(artifacts))
             st.success("Artifacts saved successfully!")
             st.rerun()
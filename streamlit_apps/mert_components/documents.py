@@ -2,10 +2,11 @@
 Enables the uploading of custom documents, i.e Persyst report
 """
 
-import asyncio
 
 import streamlit as st
 
+from services.runtime import run_sync
+
 
 @st.fragment
 def render_documents(data_manager):
@@ -24,7 +25,7 @@ def render_documents(data_manager):
                     st.write(f"- {doc_info['filename']}")
                 with col2:
                     try:
-                        document_content = asyncio.run(
+                        document_content = run_sync(
                             data_manager.download_document(doc_id)
                         )
                         st.download_button(
@@ -39,7 +40,7 @@ def render_documents(data_manager):
                 with col3:
                     if st.button("Delete", key=f"delete_{doc_id}"):
                         try:
-                            asyncio.run(data_manager.delete_document(doc_id))
+                            run_sync(data_manager.delete_document(doc_id))
                             st.success(
                                 f"Document {doc_info['filename']} deleted successfully."
                             )
@@ -59,7 +60,7 @@ def render_documents(data_manager):
     if uploaded_file is not None:
         if st.button("Submit Document"):
             try:
-                document_id = asyncio.run(data_manager.save_document(uploaded_file))
+                document_id = run_sync(data_manager.save_document(uploaded_file))
                 st.success(
                     f"Document uploaded successfully! Document ID: {document_id}"
                 )
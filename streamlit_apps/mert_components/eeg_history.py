@@ -2,10 +2,11 @@
 An EEG history component with variable report types.
 """
 
-import asyncio
 from datetime import datetime
 import streamlit as st
 
+from services.runtime import run_sync
+
 
 @st.fragment
 def render_eeg_history(data_manager):
@@ -15,7 +16,7 @@ def render_eeg_history(data_manager):
     if "all_eeg_info" not in st.session_state:
         st.warning("EEG data not loaded. Please load the data first.")
         if st.button("Load EEG Data"):
-            asyncio.run(data_manager.load_all_eeg_info())
+            run_sync(data_manager.load_all_eeg_info())
             st.rerun()
         return
 
@@ -23,7 +24,7 @@ def render_eeg_history(data_manager):
     if "eeg_reports" not in st.session_state:
         st.info("Loading EEG reports...")
         if st.button("Load Reports"):
-            asyncio.run(data_manager.load_eeg_reports())
+            run_sync(data_manager.load_eeg_reports())
             st.rerun()
         return
 
@@ -34,7 +35,7 @@ def render_eeg_history(data_manager):
 
     for eeg_id, details in eeg_data.items():
 
-        response = asyncio.run(data_manager.api.get_eeg_report(eeg_id=eeg_id))
+        response = run_sync(data_manager.api.get_eeg_report(eeg_id=eeg_id))
 
         report_lists = []
 
@@ -115,7 +116,7 @@ def render_eeg_history(data_manager):
                             data_manager.eeg_id = eeg_id
 
                             # Download EEG file
-                            eeg_content = asyncio.run(data_manager.download_eeg_file())
+                            eeg_content = run_sync(data_manager.download_eeg_file())
 
                             # Create download button
                             st.download_button(
@@ -145,13 +146,13 @@ def render_eeg_history(data_manager):
                                     data_manager.api.eeg_id = eeg_id
 
                                     if report_type == "Neuroref":
-                                        report_content = asyncio.run(data_manager.api.download_neuroref_report(report_id=report_id))
+                                        report_content = run_sync(data_manager.api.download_neuroref_report(report_id=report_id))
                                         label = "Get Neuroref"
                                     elif report_type == "Neuroref Cz":
-                                        report_content = asyncio.run(data_manager.api.download_neuroref_cz_report(report_id=report_id))
+                                        report_content = run_sync(data_manager.api.download_neuroref_cz_report(report_id=report_id))
                                         label = "Get Neuroref Cz"
                                     elif report_type == "Persyst":
-                                        report_content = asyncio.run(data_manager.api.download_document(document_id=report_id))
+                                        report_content = run_sync(data_manager.api.download_document(document_id=report_id))
                                         label = "Get Persyst"
                                     else:
                                         label = None
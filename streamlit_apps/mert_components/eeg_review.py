@@ -1,8 +1,8 @@
-import asyncio
 import streamlit as st
 import streamlit_shadcn_ui as ui
 
 from .review_utils import EEGReviewState, get_next_state, mert2_user
+from services.runtime import run_sync
 from utils.helpers import format_datetime
 
 REJECTION_REASONS = {
@@ -15,13 +15,13 @@ REJECTION_REASONS = {
 
 
 def get_eeg_info(data_manager):
-    return asyncio.run(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
+    return run_sync(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
 
 
 def handle_approve(data_manager, current_state):
     next_state = get_next_state(current_state)
     try:
-        asyncio.run(
+        run_sync(
             data_manager.update_eeg_review(
                 is_first_reviewer=False,
                 state='CLINIC_REVIEW',
@@ -40,7 +40,7 @@ def handle_reject(data_manager, current_state, reasons):
         st.error("Please select at least one rejection reason.")
         return
     try:
-        asyncio.run(
+        run_sync(
             data_manager.update_eeg_review(
                 is_first_reviewer=(current_state == EEGReviewState.PENDING),
                 state=EEGReviewState.REJECTED.name,
@@ -141,4 +141,4 @@ def render_eeg_review(data_manager):
 
 
 def get_report_addendum_eeg_id(data_manager):
-    return asyncio.run(data_manager.add_report_addendum())
+    return run_sync(data_manager.add_report_addendum())
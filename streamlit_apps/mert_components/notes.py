@@ -1,8 +1,8 @@
-import asyncio
 from datetime import datetime, timedelta
 import html
 import streamlit as st
 
+from services.runtime import run_sync
 from utils.helpers import format_datetime, parse_recording_date
 from streamlit_apps.mert_components.review_utils import EEGReviewState
 
@@ -16,7 +16,7 @@ def render_notes(data_manager, eeg_scientist_patient_notes):
     # Form for adding a new note
     with st.form("new_note_form"):
         st.write("Add New Note")
-        eeg_info = asyncio.run(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
+        eeg_info = run_sync(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
         eeg_info_data = eeg_info["eegInfo"]
         dateTime = eeg_info_data["dateTime"]
         recording_dateTime = datetime.strptime(dateTime, "%Y-%m-%dT%H:%M:%S.%fZ")
@@ -29,7 +29,7 @@ def render_notes(data_manager, eeg_scientist_patient_notes):
         content = st.text_area("Content")
         submitted = st.form_submit_button("Submit Note")
 
-        eeg_info = asyncio.run(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
+        eeg_info = run_sync(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
         analysis_meta = eeg_info["eegInfo"]["analysisMeta"]
         current_state = (
             EEGReviewState[analysis_meta["reviewState"]]
@@ -54,7 +54,7 @@ def render_notes(data_manager, eeg_scientist_patient_notes):
                 "dateEdited": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
             }
             try:
-                asyncio.run(data_manager.save_eeg_scientist_patient_note(new_note))
+                run_sync(data_manager.save_eeg_scientist_patient_note(new_note))
                 st.success("Note added successfully!")
                 st.rerun()  # Rerun the app to refresh the notes list
             except Exception as e:
@@ -68,7 +68,7 @@ def render_notes(data_manager, eeg_scientist_patient_notes):
                 "dateEdited": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
             }
             try:
-                asyncio.run(data_manager.save_eeg_scientist_patient_note(new_note, note_creation_date=eeg_recording_date))
+                run_sync(data_manager.save_eeg_scientist_patient_note(new_note, note_creation_date=eeg_recording_date))
                 st.success("Note edited successfully!")
                 st.rerun()  # Rerun the app to refresh the notes list
             except Exception as e:
@@ -1,6 +1,5 @@
 import ast
 import os
-import asyncio
 import numpy as np
 from datetime import datetime
 
@@ -8,6 +7,7 @@ import pandas as pd
 import streamlit as st
 import streamlit_shadcn_ui as ui
 import streamlit.components.v1 as components
+from services.runtime import run_sync, run_sync_all
 from utils.helpers import calculate_age, format_datetime
 from .review_utils import EEGReviewState, mert2_user
 from mywaveanalytics.pipelines import ngboost_protocol_pipeline
@@ -73,8 +73,11 @@ def render_protocol_page(data_manager):
     else:
         treatment_count = 0
 
-    # Fetch EEG info
-    eeg_info = asyncio.run(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
+    # Fetch EEG info and doctor approval state
+    eeg_info, doctor_approval_state = run_sync_all(
+        data_manager.fetch_eeg_info_by_patient_id_and_eeg_id(),
+        data_manager.get_doctor_approval_state(),
+    )
     base_protocol = eeg_info["baseProtocol"]
     analysis_meta = eeg_info["eegInfo"]["analysisMeta"]
     eeg_info_data = eeg_info["eegInfo"]
@@ -100,9 +103,6 @@ def render_protocol_page(data_manager):
     else:
         protocol_data = None
 
-    # Fetch doctor approval state
-    doctor_approval_state = asyncio.run(data_manager.get_doctor_approval_state())
-
     col1, col2 = st.columns(2)
 
     with col1:
@@ -210,16 +210,16 @@ def render_protocol_page(data_manager):
 
             n_phases = len(protocol_data["phases"])
 
-            presets = asyncio.run(data_manager.get_protocol_review_default_values(n_phases=n_phases))
+            presets = run_sync(data_manager.get_protocol_review_default_values(n_phases=n_phases))
 
             if presets and "phases" in presets:
                 preset_phases = presets["phases"]
                 phases = map_preset_to_phases(preset_phases)
         else:
             if primary_complaint == "Autism Spectrum Disorder":
-                presets = asyncio.run(data_manager.get_protocol_review_default_values(n_phases=2))
+                presets = run_sync(data_manager.get_protocol_review_default_values(n_phases=2))
             else:
-                presets = asyncio.run(data_manager.get_protocol_review_default_values(n_phases=1))
+                presets = run_sync(data_manager.get_protocol_review_default_values(n_phases=1))
 
             if presets and "phases" in presets:
                 preset_phases = presets["phases"]
@@ -355,7 +355,7 @@ def render_protocol_page(data_manager):
                 # Add a button to add new phase
                 if st.button("Add Phase", key="add_phase_button"):
                     try:
-                        presets = asyncio.run(data_manager.get_protocol_review_default_values(n_phases=st.session_state["phase_count"]))
+                        presets = run_sync(data_manager.get_protocol_review_default_values(n_phases=st.session_state["phase_count"]))
 
                         if presets and "phases" in presets:
                             preset_phases = presets["phases"]
@@ -375,7 +375,7 @@ def render_protocol_page(data_manager):
                 # Add a button to add new phase
                 if st.button("Remove Phase", key="remove_phase_button"):
                     try:
-                        presets = asyncio.run(data_manager.get_protocol_review_default_values(n_phases=st.session_state["phase_count"] - 1))
+                        presets = run_sync(data_manager.get_protocol_review_default_values(n_phases=st.session_state["phase_count"] - 1))
 
                         if presets and "phases" in presets:
                             preset_phases = presets["phases"]
@@ -533,8 +533,8 @@ def render_protocol_page(data_manager):
                         }
 
                         # Save the protocol
-                        asyncio.run(data_manager.save_protocol(protocol))
-                        asyncio.run(data_manager.save_protocol(protocol))
+                        run_sync(data_manager.save_protocol(protocol))
+                        run_sync(data_manager.save_protocol(protocol))
 
                         st.success("Protocol updated successfully!")
                         st.rerun()
@@ -591,7 +591,7 @@ def render_protocol_page(data_manager):
                         "type": "TREATMENT",
                     }
 
-                    asyncio.run(data_manager.reject_protocol(rejection_reason, protocol))
+                    run_sync(data_manager.reject_protocol(rejection_reason, protocol))
                     st.success("Protocol rejected successfully!")
                 except Exception as e:
                     st.error(f"Failed to reject protocol: {str(e)}")
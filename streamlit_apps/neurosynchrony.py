@@ -1,9 +1,7 @@
-
 """
 Set up the primary UI for eeg report and protocol review.
 """
 
-import asyncio
 import logging
 import os
 import pandas as pd
@@ -14,6 +12,7 @@ from streamlit_pdf_viewer import pdf_viewer
 
 from access_control import access_eeg_data
 from services.mert2_data_management.mert_data_manager import MeRTDataManager
+from services.runtime import run_sync, run_sync_all
 from streamlit_apps.mert_components import (render_abnormalities,
                                             render_artifact_distortions,
                                             render_documents,
@@ -56,11 +55,12 @@ if (
             eeg_id=addendum_eeg_id,
             clinic_id=st.session_state["clinicid"],
         )
-        # Load all data into session state
-        asyncio.run(data_manager.load_all_data())
-
-        # If in addendum mode and we have the original EEG ID stored
-        asyncio.run(access_eeg_data(st.session_state["eegid"]))
+        # Load all data into session state while the original EEG ID is loaded,
+        # if in addendum mode and we have it stored
+        run_sync_all(
+            data_manager.load_all_data(),
+            access_eeg_data(st.session_state["eegid"]),
+        )
 
         st.header("Addendum")
 
@@ -75,10 +75,12 @@ if (
             clinic_id=st.session_state["clinicid"],
         )
 
-        # Load all data into session state
-        asyncio.run(data_manager.load_all_data())
-        # Default behavior - use current EEG ID
-        asyncio.run(access_eeg_data(st.session_state["eegid"]))
+        # Load all data into session state, and the current EEG ID (default
+        # behavior) concurrently
+        run_sync_all(
+            data_manager.load_all_data(),
+            access_eeg_data(st.session_state["eegid"]),
+        )
 
 
         base_url = "https://lab.wavesynchrony.com"
@@ -150,11 +152,11 @@ def eeg_dropdown():
 
 def delete_report(data_manager, report_id, ref="default"):
     if ref == "default":
-        asyncio.run(data_manager.delete_neuroref_report(report_id))
+        run_sync(data_manager.delete_neuroref_report(report_id))
         st.success(f"Neuroref {report_id} successfully deleted!")
         st.rerun()
     elif ref == "cz":
-        asyncio.run(data_manager.delete_neuroref_cz_report(report_id))
+        run_sync(data_manager.delete_neuroref_cz_report(report_id))
         st.success(f"Neuroref Cz {report_id} successfully deleted!")
         st.rerun()
 
@@ -313,7 +315,7 @@ with col1:
         st.subheader("Reports")
 
 
-        eeg_info = asyncio.run(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
+        eeg_info = run_sync(data_manager.fetch_eeg_info_by_patient_id_and_eeg_id())
         analysis_meta = eeg_info["eegInfo"]["analysisMeta"]
         eeg_filename = eeg_info["eegInfo"]['fileName']
         current_state = (
@@ -377,7 +379,7 @@ with col1:
         base, ext = os.path.splitext(os.path.basename(eeg_filename))
         new_filename = eeg_filename.replace(base, st.session_state.eegid)
 
-        if st.download_button(label="Download EEG", data= asyncio.run(data_manager.download_eeg_file()), mime="application/octet-stream", file_name=new_filename):
+        if st.download_button(label="Download EEG", data= run_sync(data_manager.download_eeg_file()), mime="application/octet-stream", file_name=new_filename):
             pass
 
 
@@ -393,7 +395,7 @@ with col1:
             approved_eegs = edited_eeg_history_df[
                 edited_eeg_history_df["include?"] == True
             ]
-            asyncio.run(
+            run_sync(
                 data_manager.update_neuroref_reports(
                     approved_eegs["EEGId"].values.tolist()
                 )
@@ -404,7 +406,7 @@ with col1:
             approved_eegs = edited_eeg_history_df[
                 edited_eeg_history_df["include?"] == True
             ]
-            asyncio.run(
+            run_sync(
                 data_manager.update_neuroref_cz_reports(
                     approved_eegs["EEGId"].values.tolist()
                 )
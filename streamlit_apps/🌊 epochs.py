@@ -1,13 +1,12 @@
-import asyncio
-
 import streamlit as st
 
 from access_control import access_eeg_data, get_version_from_pyproject
+from services.runtime import run_sync
 from streamlit_dashboards import eeg_epoch_visualization_dashboard
 
 
 if "eegid" in st.session_state and ("hyperlink_id" not in st.session_state ):
-    asyncio.run(access_eeg_data(st.session_state.eegid))
+    run_sync(access_eeg_data(st.session_state.eegid))
     eeg_epoch_visualization_dashboard()
 
 else:
@@ -16,13 +15,13 @@ else:
 
     if uploaded_file:
         st.session_state["hyperlink_id"] = False
-        asyncio.run(access_eeg_data(uploaded_file=uploaded_file))
+        run_sync(access_eeg_data(uploaded_file=uploaded_file))
 
 
     if st.button("Download EEG Data"):
         st.session_state["eegid"] = eeg_id
         st.session_state["hyperlink_id"] = False
-        asyncio.run(access_eeg_data(st.session_state.eegid))
+        run_sync(access_eeg_data(st.session_state.eegid))
 
 eeg_epoch_visualization_dashboard()
 
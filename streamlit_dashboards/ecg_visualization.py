@@ -99,7 +99,7 @@ def ecg_visualization_dashboard():
                         st.session_state["ahr"] = ahr_df
 
                 # Create DataFrame from MyWaveAnalytics object
-                df = st.session_state.ecg_graph
+                df = st.session_state.eeg_graph.ecg
 
                 # Generate the Plotly figure
                 with st.spinner("Rendering..."):
@@ -1,3 +1,4 @@
+import math
 import pandas as pd
 import time
 from datetime import datetime
@@ -13,10 +14,10 @@ from mywaveanalytics.utils.params import (
     CHANNEL_ORDER_PERSYST,
 )
 
-import dsp.graph_preprocessing as waev
 import graph_helpers.eeg_viewer_helper as evh
+from dsp.graph_preprocessing import eeg_scale
 from data_models.abnormality_parsers import serialize_aea_to_pandas
-from graphs.eeg_viewer import draw_eeg_graph
+from graphs.eeg_viewer import EEGFigureCache
 
 import os
 
@@ -24,6 +25,55 @@ DATABRICKS_BUCKET = os.getenv("DATABRICKS_BUCKET")
 ABNORMALITY_FEEDBACK_BUCKET = os.getenv("ABNORMALITY_FEEDBACK_BUCKET")
 
 
+EEG_WINDOW_SECONDS = 20.0
+WINDOW_OPTIONS = ["10", "20", "30", "60", "300", "900"]
+
+
+def eeg_window_controls(duration, window_seconds=EEG_WINDOW_SECONDS):
+    """
+    Buttons and slider moving the window of the recording shown by the viewer.
+
+    :param duration: (float) length of the recording in seconds.
+    :param window_seconds: (float) length of the window in seconds.
+    :return: (tuple) visible (start, end) in seconds.
+    """
+    last_start = max(math.floor(duration - window_seconds), 0)
+    st.session_state.window_start = min(
+        st.session_state.get("window_start", 0), last_start
+    )
+
+    def shift_window(step):
+        st.session_state.window_start = int(
+            min(max(st.session_state.window_start + step, 0), last_start)
+        )
+
+    col1, col2, col3 = st.columns([1, 10, 1])
+    col1.button(
+        "◀",
+        key="window_previous",
+        on_click=shift_window,
+        args=(-int(window_seconds),),
+        use_container_width=True,
+    )
+    col2.slider(
+        "Window start (s)",
+        min_value=0,
+        max_value=max(last_start, 1),
+        key="window_start",
+        label_visibility="collapsed",
+    )
+    col3.button(
+        "▶",
+        key="window_next",
+        on_click=shift_window,
+        args=(int(window_seconds),),
+        use_container_width=True,
+    )
+
+    start = float(st.session_state.window_start)
+    return start, start + window_seconds
+
+
 def eeg_visualization_dashboard():
     # Title
     st.title("EEG Visualization Dashboard")
@@ -155,8 +205,17 @@ def eeg_visualization_dashboard():
                             index=5,  # Persisted value
                         )
 
-                    # Dummy columns to decrease the width of the dropdown widgets used
-                    with sub_col3: pass
+                    with sub_col3:
+                        window_seconds = float(
+                            st.selectbox(
+                                "Window in s",
+                                options=WINDOW_OPTIONS,
+                                index=WINDOW_OPTIONS.index("20"),
+                                key="window_seconds",
+                            )
+                        )
+
+                    # Dummy column to decrease the width of the dropdown widgets used
                     with sub_col4: pass
 
                 with col2:
@@ -169,18 +228,26 @@ def eeg_visualization_dashboard():
                         value=True,
                         key="highlight_ml_onsets",
                     )
+                    windowed_view = st.toggle(
+                        "Windowed View",
+                        value=True,
+                        key="windowed_view",
+                        help="Only send the visible window to the browser, move with the window controls.",
+                    )
 
 
-            # Create DataFrame from MyWaveAnalytics object
-            df = st.session_state.eeg_graph[selected_reference]
+            eeg_graph = st.session_state.eeg_graph
 
-            if df is not None:
+            if eeg_graph is not None:
                 # Convert the sensitivity value to float
                 eeg_sensitivity_value = float(st.session_state.sensitivity)
 
-                # Generate the Plotly figure
-                with st.spinner("Scaling..."):
-                    df = waev.scale_dataframe(df=df, eeg_sensitivity_uv=eeg_sensitivity_value)
+                window = None
+                if windowed_view:
+                    window = eeg_window_controls(
+                        eeg_graph.duration, window_seconds
+                    )
+
                 with st.spinner("Rendering..."):
                     # Define the order of channels based on reference
                     if selected_reference in ["linked_ears", "centroid"]:
@@ -188,7 +255,31 @@ def eeg_visualization_dashboard():
                     elif selected_reference in ["bipolar_longitudinal"]:
                         ordered_channels = CHANNEL_ORDER_BIPOLAR_LONGITUDINAL
 
-                    fig = draw_eeg_graph(df, selected_reference, ordered_channels)
+                    # The figure is kept while only the sensitivity or the
+                    # overlays change, which then just rescale its traces or
+                    # replace its shapes.
+                    figure_key = (
+                        st.session_state.get("recording_fingerprint"),
+                        selected_reference,
+                        window,
+                        window_seconds,
+                    )
+                    figures = st.session_state.setdefault(
+                        "eeg_figure_cache", EEGFigureCache()
+                    )
+                    # The montage (DataFrame, min/max pyramid) is only read, and
+                    # built on its first view, when the figure is rebuilt. The
+                    # statistics are only needed to autoscale, the sensitivity is
+                    # set in uV.
+                    fig = figures.figure(
+                        figure_key,
+                        eeg_graph,
+                        selected_reference,
+                        ordered_channels,
+                        scale=eeg_scale(None, eeg_sensitivity_uv=eeg_sensitivity_value),
+                        window=window,
+                        margin=window_seconds / 2,
+                    )
 
                 def select_event_callback():
                     # Turn the event into an ordered list
@@ -1,7 +1,7 @@
-import numpy as np
 import streamlit as st
 
-from dsp.analytics import PersistPipeline, StandardPipeline
+from dsp.analytics import PersistPipeline, StandardPipeline, get_epoch_cache
+from utils.helpers import recording_fingerprint
 
 
 def eeg_epoch_visualization_dashboard():
@@ -32,10 +32,22 @@ def eeg_epoch_visualization_dashboard():
 
         # Check if `mw_object` is available
         if "mw_object" in st.session_state and st.session_state.mw_object:
-            mw_object = st.session_state.mw_object.copy()
-
-            eqi_pipeline = StandardPipeline(mw_object)
-            eqi_pipeline.calculate_eqi()
+            # Pipelines copy the recording themselves, and only on a cache miss.
+            mw_object = st.session_state.mw_object
+
+            fingerprint = st.session_state.get("recording_fingerprint")
+            if fingerprint is None:
+                fingerprint = recording_fingerprint(mw_object.eeg)
+                st.session_state.recording_fingerprint = fingerprint
+
+            epoch_cache = get_epoch_cache()
+            if ("eqi", fingerprint) in epoch_cache:
+                st.session_state.eqi = epoch_cache.get(("eqi", fingerprint))
+            else:
+                eqi_pipeline = StandardPipeline(mw_object)
+                eqi_pipeline.calculate_eqi()
+                if st.session_state.get("eqi", None) is not None:
+                    epoch_cache.put(("eqi", fingerprint), st.session_state.eqi)
 
             eqi = st.session_state.get("eqi", None)
             ref = st.session_state.get("ref", "le")
@@ -86,13 +98,17 @@ def eeg_epoch_visualization_dashboard():
             with st.spinner("Running pipeline..."):
                 pipeline = run_persist_pipeline(mw_object)
                 if pipeline:
-                    pipeline.run(ref=ref, time_win=time_win)
+                    pipeline.run_cached(fingerprint, ref=ref, time_win=time_win)
                     with st.spinner("Drawing all epochs..."):
                         fig = pipeline.plot_3d_psd()
                         st.plotly_chart(fig)
-                        pipeline.data['average_psds'] = pipeline.data['flattened_psds'].apply(lambda x: np.array(x).reshape(19,-1).mean(axis=0)[11:51])
+                        # Cached results are shared, add display columns to a copy.
+                        epochs_metadata = pipeline.data.assign(
+                            average_psds=pipeline.results.average_psds(),
+                            bads=pipeline.results.bads_names(),
+                        )
                         st.write("Epochs Metadata")
-                        st.dataframe(pipeline.data, use_container_width=True, column_order=['average_psds', 'sync_score', 'alpha', 'bads', 'n_bads'],
+                        st.dataframe(epochs_metadata, use_container_width=True, column_order=['average_psds', 'sync_score', 'alpha', 'bads', 'n_bads'],
                                     column_config={
                                         "average_psds": st.column_config.AreaChartColumn(label="Average PSD (4-20 Hz)")
                                     })
@@ -100,12 +116,9 @@ def eeg_epoch_visualization_dashboard():
                     if st.button("Generate epoch graph"):
                         with st.spinner("Drawing..."):
                             pipeline.combined_plot(epoch_num)
-                            pipeline.reset(mw_object)
                     if st.button("Generate top 20 epoch graphs"):
                         with st.spinner("Drawing..."):
-                            pipeline.generate_graphs()
-                            pipeline.reset(mw_object)
-                pipeline.reset(mw_object)
+                            pipeline.generate_graphs(parallel=True)
 
         else:
             st.error(
@@ -0,0 +1,159 @@
+"""
+In-process caches shared by every Streamlit session of the server.
+"""
+
+import functools
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from plotly.basedatatypes import BaseFigure
+
+MEMO_CACHE_BYTES = int(os.getenv("MEMO_CACHE_BYTES", 512 * 1024**2))
+
+# Caches of the memoized functions, by qualified function name
+_MEMO_CACHES = {}
+
+
+def estimate_nbytes(value):
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, BaseFigure):
+        return sum(
+            estimate_nbytes(trace[prop])
+            for trace in value.data
+            for prop in ("x", "y", "z", "surfacecolor", "customdata")
+            if prop in trace
+        )
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(v) for v in value)
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return 64
+
+
+class ByteLRUCache:
+    """Thread-safe least-recently-used cache bounded by the bytes of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        """Store value under key, evicting the least recently used entries to fit.
+
+        Values larger than the whole budget are not cached.
+        """
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return value
+            while self._entries and self.nbytes + nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, nbytes = self._entries.pop(key)
+            self.nbytes -= nbytes
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Hit and miss counts of get, with the entries and bytes held."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_MISSING = object()
+
+
+def memoize(max_bytes=MEMO_CACHE_BYTES):
+    """Memoize a function in a ByteLRUCache shared by every session.
+
+    Like st.cache_data, arguments whose name starts with an underscore are not
+    part of the key. The others, typically a recording fingerprint
+    (utils.helpers.recording_fingerprint) and scalar parameters, must be
+    hashable, so a lookup costs the same whatever the size of the data passed
+    in the underscore arguments. Results are returned as is, not copied, and
+    must not be mutated.
+
+    The cache of a memoized function is its cache attribute, see also
+    memoize_stats.
+
+    :param max_bytes: (int) memory budget of the results, see estimate_nbytes.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        keyed = [name for name in signature.parameters if not name.startswith("_")]
+        name = f"{func.__module__}.{func.__qualname__}"
+        cache = _MEMO_CACHES.setdefault(name, ByteLRUCache(max_bytes=max_bytes))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments[name] for name in keyed)
+
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = cache.put(key, func(*args, **kwargs))
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def memoize_stats():
+    """Stats of the cache of every memoized function, by qualified function name."""
+    return {name: cache.stats() for name, cache in _MEMO_CACHES.items()}
@@ -34,17 +34,28 @@ def smooth_psd(psd, window_len=10):
 
     Parameters
     ----------
-    psd : 1-D array
-        Power spectral density data.
+    psd : array
+        Power spectral density data, smoothed along the last axis.
     window_len : int, optional
         The length of the smoothing window.
 
     Returns
     -------
-    smoothed_psd : 1-D array
+    smoothed_psd : array
         Smoothed PSD data.
     """
-    window = np.ones(int(window_len)) / float(window_len)
-    smoothed_psd = np.convolve(psd, window, "same")
+    psd = np.asarray(psd)
+    if psd.ndim == 1:
+        window = np.ones(int(window_len)) / float(window_len)
+        return np.convolve(psd, window, "same")
+
+    # Same alignment as np.convolve(..., "same") for every row at once.
+    window_len = int(window_len)
+    n = psd.shape[-1]
+    pad = [(0, 0)] * (psd.ndim - 1) + [(window_len - 1, window_len - 1)]
+    padded = np.pad(psd, pad)
+    full = sum(padded[..., j : j + n + window_len - 1] for j in range(window_len))
+    start = (window_len - 1) // 2
+    smoothed_psd = full[..., start : start + n] / float(window_len)
 
     return smoothed_psd
@@ -2,6 +2,7 @@
 A collection of helper function that can be used across the system.
 """
 
+import hashlib
 import numpy as np
 import pytz
 from datetime import datetime, date
@@ -42,6 +43,65 @@ def order_channels(channels, ordered_list):
     return ordered_channels + remaining_channels
 
 
+def recording_fingerprint(raw):
+    """
+    Content hash identifying a recording, used as a cache key across sessions.
+
+    Args:
+    - raw (mne.io.Raw): the recording, after loading filters are applied.
+
+    Returns:
+    - fingerprint (str): hex digest of the channel layout, timing and signal.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((raw.ch_names, raw.info["sfreq"], raw.n_times)).encode())
+    digest.update(str(raw.info["meas_date"]).encode())
+    digest.update(np.ascontiguousarray(raw.get_data()).data)
+    return digest.hexdigest()
+
+
+ALPHA_PERCENTILES = [40, 60, 80, 95, 99]
+ALPHA_GRADE_LABELS = np.array(["F", "E", "D", "C", "B", "A"])
+BADS_LIMITS = [3, 9, 12, 15]
+BADS_GRADE_LABELS = np.array(["A", "B", "C", "D", "F"])
+
+
+def alpha_thresholds(all_scores):
+    """
+    Percentile thresholds of the E, D, C, B and A alpha grades, in ascending order.
+
+    Args:
+    - all_scores (list of float): List of all scores to determine the percentiles.
+
+    Returns:
+    - thresholds (numpy.ndarray): minimum score of each grade from E to A.
+    """
+    return np.percentile(all_scores, ALPHA_PERCENTILES)
+
+
+def grade_alphas(scores, all_scores=None):
+    """
+    Assign a letter grade to every score based on where it ranks within all_scores.
+
+    The percentile thresholds are computed once, every score is then graded with a
+    binary search.
+
+    Args:
+    - scores (array of float): The scores to grade.
+    - all_scores (array of float): Scores to determine the percentiles, defaults to scores.
+
+    Returns:
+    - grades (numpy.ndarray): The letter grade of each score.
+    """
+    scores = np.asarray(scores, dtype=float)
+    thresholds = alpha_thresholds(scores if all_scores is None else all_scores)
+
+    # Number of thresholds each score reaches, score >= threshold
+    ranks = np.searchsorted(thresholds, scores, side="right")
+    ranks[np.isnan(scores)] = 0
+    return ALPHA_GRADE_LABELS[ranks]
+
+
 def grade_alpha(score, all_scores):
     """
     Assign a letter grade based on where the score ranks within all_scores using percentiles.
@@ -53,27 +113,7 @@ def grade_alpha(score, all_scores):
     Returns:
     - grade (str): The letter grade.
     """
-
-    A_threshold = np.percentile(all_scores, 99)
-    B_threshold = np.percentile(all_scores, 95)
-    C_threshold = np.percentile(all_scores, 80)
-    D_threshold = np.percentile(all_scores, 60)
-    E_threshold = np.percentile(all_scores, 40)
-
-    if score >= A_threshold:
-        grade = "A"
-    elif score >= B_threshold:
-        grade = "B"
-    elif score >= C_threshold:
-        grade = "C"
-    elif score >= D_threshold:
-        grade = "D"
-    elif score >= E_threshold:
-        grade = "E"
-    else:
-        grade = "F"
-
-    return grade
+    return str(grade_alphas([score], all_scores)[0])
 
 
 def grade_bads(bad_count):
@@ -83,18 +123,17 @@ def grade_bads(bad_count):
     :param bad_count: (int) The number of bad items.
     :return: (str) The grade corresponding to the number of bad items.
     """
-    if bad_count < 1:
-        return "A"
-    elif bad_count > 15:
-        return "F"
-    elif bad_count > 12:
-        return "D"
-    elif bad_count > 9:
-        return "C"
-    elif bad_count > 3:
-        return "B"
-    else:
-        return "A"
+    return str(grade_bads_array([bad_count])[0])
+
+
+def grade_bads_array(bad_counts):
+    """
+    Assigns a grade to every number of bad items at once.
+
+    :param bad_counts: (array of int) The number of bad items of each entry.
+    :return: (numpy.ndarray) The grade corresponding to each number of bad items.
+    """
+    return BADS_GRADE_LABELS[np.searchsorted(BADS_LIMITS, bad_counts, side="left")]
 
 
 